@@ -1,5 +1,3 @@
-import random
-
 import pygame
 
 from swarmy.agent import Agent
@@ -26,15 +24,29 @@ class MyAgent(Agent):
 
         for attempt in range(max_attempts):
             # Generate random position within safe bounds
-            x = random.randint(margin, self.config["world_width"] - margin)
-            y = random.randint(margin, self.config["world_height"] - margin)
-            gamma = random.randint(0, 360)
+            x = self.random.randint(margin, self.config["world_width"] - margin)
+            y = self.random.randint(margin, self.config["world_height"] - margin)
+            gamma = self.random.randint(0, 360)
 
             # Check if position collides with static obstacles
             collision_detected = False
 
-            # Check against static rectangles (obstacles)
-            for rect_obj in self.environment.get_static_rect_list():
+            # Check against the walls of a map file (occupancy grid)
+            world_map = self.environment.worldMap
+            if world_map is not None and not world_map.area_free(x, y, robot_radius):
+                continue
+
+            # Check against nearby static rectangles (obstacles)
+            rects = self.environment.get_static_rect_list()
+            grid = self.environment.staticRectGrid
+            if grid is None:
+                candidates = range(len(rects))
+            else:
+                candidates = grid.query_rect(x - 20, y - 20, x + 20, y + 20)
+            for i in candidates:
+                if i in self.environment.mapRects:
+                    continue
+                rect_obj = rects[i]
                 # Skip walls (the first 4 rectangles are walls)
                 if rect_obj[2] == 5:  # Wall has border_width = 5
                     continue
@@ -80,7 +92,7 @@ class MyAgent(Agent):
         )
         x = self.config["world_width"] // 2
         y = self.config["world_height"] // 2
-        gamma = random.randint(0, 360)
+        gamma = self.random.randint(0, 360)
         self.actuation.position[0] = x
         self.actuation.position[1] = y
         self.actuation.angle = gamma
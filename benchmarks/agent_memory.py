@@ -0,0 +1,61 @@
+"""
+Description:
+Measures the memory of the per-agent objects (agent, body, actuation, processing,
+perception) with tracemalloc and reports the bytes per agent and the modules that
+allocated them.
+
+Usage (from the repository root):
+    python benchmarks/agent_memory.py [number_of_agents]
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import gc
+import os
+import sys
+import tracemalloc
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+from agent.my_agent import MyAgent
+from controller.my_controller import MyController
+from sensors.bumper_sensor import BumperSensor
+from world.my_world import My_environment
+from swarmy.experiment import Experiment
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+def main(number_of_agents=10000):
+    with open('config.yaml') as file:
+        config = yaml.load(file, Loader=yaml.FullLoader)
+    config['number_of_agents'] = number_of_agents
+    config['world_width'] = config['world_height'] = 20000   # room for all agents
+
+    pygame.init()
+    experiment = Experiment(config, [MyController], [BumperSensor], My_environment, MyAgent)
+    environment = experiment.world
+    environment.render_init(-1)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    agents = experiment.create_agents(environment)
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    total = sum(s.size_diff for s in stats)
+    print('{} agents: {:.1f} MB, {:.0f} bytes per agent'.format(len(agents), total / 2**20, total / len(agents)))
+    for s in stats[:8]:
+        print('  {:>8.0f} B/agent  {}'.format(s.size_diff / len(agents), s.traceback[0].filename))
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
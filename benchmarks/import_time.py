@@ -0,0 +1,84 @@
+"""
+Description:
+Measures the startup cost of a worker: interpreter start, `import swarmy.experiment`
+and a headless one-timestep run, each in fresh processes (median of several runs).
+Also checks that the headless core does not load pygame or matplotlib.
+
+Usage (from the repository root):
+    python benchmarks/import_time.py [repeats]
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADLESS_RUN = """
+import yaml
+from swarmy.experiment import Experiment
+from swarmy.environment import Environment
+from swarmy.agent import Agent
+from swarmy.actuation import Actuation
+
+class World(Environment):
+    def add_static_rectangle_object(self): pass
+    def add_static_circle_object(self): pass
+    def set_background_color(self): pass
+
+class Walker(Agent):
+    def initial_position(self): self.set_position(100, 100, 0)
+
+class Forward(Actuation):
+    def __init__(self, agent, config): super().__init__(agent)
+    def torus(self): pass
+    def controller(self): self.stepForward(1)
+
+with open('config.yaml') as file:
+    config = yaml.load(file, Loader=yaml.FullLoader)
+config.update(max_timestep=1, number_of_agents=10, result_cache=None)
+Experiment(config, [Forward], [], World, Walker).run(-1)
+"""
+
+CASES = [
+    ('interpreter', 'pass'),
+    ('import numpy', 'import numpy'),
+    ('import pygame', 'import pygame'),
+    ('import swarmy.experiment', 'import swarmy.experiment'),
+    ('headless 1-step run', HEADLESS_RUN),
+]
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+def measure(code, repeats):
+    """
+    Returns: median wall time in seconds of `python -c code` in a fresh process
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(repeats=7):
+    for name, code in CASES:
+        print('{:<26} {:7.1f} ms'.format(name, measure(code, repeats) * 1000))
+
+    check = ('import sys, swarmy.experiment, swarmy.environment; '
+             "print(' '.join(m for m in ('pygame', 'matplotlib') if m in sys.modules) or 'none')")
+    loaded = subprocess.run([sys.executable, '-c', check], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout.strip()
+    print('heavy modules loaded by the headless core: {}'.format(loaded))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 7)
@@ -1,4 +1,3 @@
-import random
 
 from swarmy.actuation import Actuation
 
@@ -36,8 +35,11 @@ class MyController(Actuation):
         self.max_x = self.config["world_width"] - margin
         self.min_y = margin
         self.max_y = self.config["world_height"] - margin
+        self.periodic = self.config.get("topology", "bounded") == "torus"
 
     def is_near_boundary(self):
+        if self.periodic:
+            return False  # no walls on a torus
         x, y, _ = self.agent.get_position()
         tolerance = 15
         return (
@@ -80,7 +82,7 @@ class MyController(Actuation):
             # Turning phase
             if self.turn_counter < self.turn_frames:
                 if self.turn_counter == 0:
-                    self.turn_direction = random.choice([-1, 1])
+                    self.turn_direction = self.random.choice([-1, 1])
                 self.turn_right(self.turn_direction * self.angle_velocity * 3)
                 self.turn_counter += 1
                 self.was_reversing = False
@@ -88,7 +90,7 @@ class MyController(Actuation):
 
             # Reverse phase (short & interruptible)
             if self.escape_counter == 0:
-                self.escape_counter = random.randint(self.rev_min, self.rev_max)
+                self.escape_counter = self.random.randint(self.rev_min, self.rev_max)
 
             if self.escape_counter > 0:
                 # Re-check collision every frame to prevent tunneling
@@ -114,14 +116,16 @@ class MyController(Actuation):
 
         # Normal exploration forward
         self.stepForward(self.linear_velocity)
-        if random.random() < 0.08:
-            delta = random.randint(-2, 2) * self.angle_velocity
+        if self.random.random() < 0.08:
+            delta = self.random.randint(-2, 2) * self.angle_velocity
             if delta > 0:
                 self.turn_left(delta)
             elif delta < 0:
                 self.turn_right(-delta)
 
     def torus(self):
+        if self.periodic:
+            return  # positions are wrapped by the environment
         x, y, ang = self.agent.get_position()
         cx = max(self.min_x, min(x, self.max_x))
         cy = max(self.min_y, min(y, self.max_y))
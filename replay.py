@@ -0,0 +1,15 @@
+import sys
+
+import yaml
+
+from swarmy.replay import Replay
+
+### load the configuration file, the world size and world class have to match the recorded run
+with open("config.yaml", "r") as file:
+    config = yaml.load(file, Loader=yaml.FullLoader)
+from world.my_world import My_environment
+
+# usage: python3 replay.py [trajectory file], defaults to record_trajectory in config.yaml
+path = sys.argv[1] if len(sys.argv) > 1 else config["record_trajectory"]
+
+Replay(config, My_environment, path).run()
@@ -1,13 +1,10 @@
 import math
 
+import numpy as np
 import pygame
 
 from swarmy.perception import Perception
 
-# Reused across all agents per frame
-_SPATIAL_GRID = {}
-_SPATIAL_FRAME_AGENTLIST_ID = None  # tracks the list object identity for one frame
-
 
 class BumperSensor(Perception):
     def __init__(self, agent, environment, config):
@@ -18,39 +15,14 @@ class BumperSensor(Perception):
 
         # Tunables
         self.collision_distance_threshold = 60
-        self.cell_size = self.config.get("spatial_cell_size", 80)
         self.draw_bumpers = self.config.get("draw_bumpers", 1)
+        # Positions along a bumper bar (45 px long) checked against other robots,
+        # closer than the 4 px wheels of a robot body
+        self.bar_samples = np.linspace(0, 1, 13)[:, None]
 
-        # Precompute statics (never change)
-        self._static_rects = [r[1] for r in self.environment.get_static_rect_list()]
-        self._static_circles = [
-            (c[1][0], c[1][1], c[2]) for c in self.environment.get_static_circ_list()
-        ]
-
-    def _build_spatial_grid_if_new_frame(self):
-        """
-        Build the spatial grid once per frame for all agents.
-        We detect a new frame by a new agent_object_list instance created in Experiment.run().
-        """
-        global _SPATIAL_GRID, _SPATIAL_FRAME_AGENTLIST_ID
-        agent_list_obj = self.environment.get_agent_object()
-        cur_id = id(agent_list_obj)
-        if _SPATIAL_FRAME_AGENTLIST_ID == cur_id:
-            return  # already built for this frame
-
-        # new frame: rebuild
-        _SPATIAL_GRID = {}
-        for rect in agent_list_obj:
-            cx = rect.centerx // self.cell_size
-            cy = rect.centery // self.cell_size
-            _SPATIAL_GRID.setdefault((cx, cy), []).append(rect)
-
-        _SPATIAL_FRAME_AGENTLIST_ID = cur_id
+        # Static objects are read from the environment (no copy per robot)
 
     def sensor(self):
-        # Build grid once per frame
-        self._build_spatial_grid_if_new_frame()
-
         rx, ry, heading = self.agent.get_position()
 
         # Precompute bumper endpoints (front + rear bars)
@@ -63,34 +35,52 @@ class BumperSensor(Perception):
         rear_l = endpoint(heading + 180, +40, 35)
         rear_r = endpoint(heading + 180, -40, 35)
 
-        if self.draw_bumpers:
-            self.environment.add_dynamic_line_object([(255, 0, 0), front_l, front_r])
-            self.environment.add_dynamic_line_object([(255, 165, 0), rear_l, rear_r])
+        overlay = self.environment.overlay
+        if self.draw_bumpers and overlay.enabled:
+            overlay.add_line((255, 0, 0), front_l, front_r)
+            overlay.add_line((255, 165, 0), rear_l, rear_r)
 
         # Fast distance pruning for static circles (squared distance, no sqrt)
         rr_margin = 40  # robot radius + safety
-        rr_margin_sq = rr_margin * rr_margin
         rx_f = float(rx)
         ry_f = float(ry)
-        for cx, cy, rad in self._static_circles:
+        for circle in self.environment.get_static_circ_list():
+            (cx, cy), rad = circle[1], circle[2]
             dx = rx_f - float(cx)
             dy = ry_f - float(cy)
             if dx * dx + dy * dy < float(rad + rr_margin) ** 2:
                 return 1
 
-        # Collect nearby rectangles via spatial hash (neighbors)
-        cx = int(rx // self.cell_size)
-        cy = int(ry // self.cell_size)
-        nearby_rects = []
-        for ox in (-1, 0, 1):
-            for oy in (-1, 0, 1):
-                cell = (cx + ox, cy + oy)
-                rects = _SPATIAL_GRID.get(cell)
-                if rects:
-                    nearby_rects.extend(rects)
-
-        # Include static rects (walls + static obstacles); few in number
-        nearby_rects.extend(self._static_rects)
+        # Other robots: points along both bumper bars tested against the exact
+        # body outlines (minimum-image on a torus, so robots across the seam count)
+        t = self.bar_samples
+        bar_points = np.concatenate(
+            [
+                np.add(front_l, t * np.subtract(front_r, front_l)),
+                np.add(rear_l, t * np.subtract(rear_r, rear_l)),
+            ]
+        )
+        hits, _ = self.environment.bodies_at(bar_points, exclude=self.agent.actuation.slot)
+        if len(hits):
+            return 1
+
+        # Walls of a map file: sample both bumper bars in the occupancy grid
+        world_map = self.environment.worldMap
+        if world_map is not None and world_map.segments_blocked(
+            (front_l, rear_l), (front_r, rear_r)
+        ).any():
+            return 1
+
+        # Nearby static rects (walls + static obstacles) from the static grid
+        static_rects = self.environment.get_static_rect_list()
+        grid = self.environment.staticRectGrid
+        map_rects = self.environment.mapRects
+        reach = 35 + 15  # bumper reach + half body
+        if grid is None:
+            candidates = range(len(static_rects))
+        else:
+            candidates = grid.query_rect(rx_f - reach, ry_f - reach, rx_f + reach, ry_f + reach)
+        nearby_rects = [static_rects[i][1] for i in candidates if i not in map_rects]
 
         # Line-line intersection helpers
         def line_intersects_line(p1, p2, p3, p4):
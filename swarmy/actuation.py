@@ -13,10 +13,7 @@ The module represents the motion capabilites of an agent.
 # Imports
 # =============================================================================
 import math
-import pygame
 from abc import abstractmethod
-import numpy as np
-import yaml
 # =============================================================================
 # Class
 # =============================================================================
@@ -32,6 +29,9 @@ class Actuation():
         g (agent.py): instance of the agent
         p ([int, int]): center position
         d (int): initial angle (direction)    
+
+    Position and heading are not stored in the object, they are read from the agent's
+    row (slot) of the swarm arrays of the environment.
     """
     def __init__(self, g):
         """
@@ -41,13 +41,48 @@ class Actuation():
 
         # variables
         self.agent = g                  # parent python module
-        self.position = [0,0]
-        self.angle  = 0
-        self.direction = [0,0]          # unit vector showing the direction
+        self.slot = g.environment.add_agent_slot(self)
+        self.timeBased = g.environment.integrator is not None      # velocities per second, see integrator.py
+        self.linearCommand = 0.0        # commanded speed of this timestep (time based motion only)
+        self.turnCommand = 0.0          # commanded turn rate of this timestep (time based motion only)
+        self.config = g.environment.config      # shared configuration, not a copy per agent
+
+    def bind_state(self, slot):
+        """
+        Attach position and heading to a row of the swarm arrays of the environment.
+        """
+        self.slot = slot
+
+    @property
+    def random(self):
+        """
+        Random generator of the agent (use it instead of the random module, see experiment.step_agents)
+        """
+        return self.agent.random
+
+    @property
+    def position(self):
+        """
+        View on the row of the swarm position array (read and write)
+        """
+        return self.agent.environment.agent_positions[self.slot]
+
+    @property
+    def heading(self):
+        """
+        One element view on the swarm heading array
+        """
+        slot = self.slot
+        return self.agent.environment.agent_headings[slot:slot+1]
+
+    @property
+    def angle(self):
+        return self.agent.environment.agent_headings[self.slot]
+
+    @angle.setter
+    def angle(self, value):
+        self.agent.environment.agent_headings[self.slot] = value
 
-        with open('config.yaml', 'r') as file:
-            self.config = yaml.load(file, Loader=yaml.FullLoader)
-            
     @abstractmethod
     def torus(self):
         print('Torus not implemented')
@@ -59,7 +94,11 @@ class Actuation():
     def stepForward(self, velocity):
         """
         One step forward.
+        With time based motion (dt > 0) velocity is a speed in world units per second.
         """
+        if self.timeBased:
+            self.linearCommand += velocity
+            return
 
         # calculate the position from the direction and speed and update body position
         robot_position_x, robot_position_y, robot_heading = self.agent.get_position()
@@ -75,7 +114,11 @@ class Actuation():
     def stepBackward(self,velocity):
         """
         One step backward.
+        With time based motion (dt > 0) velocity is a speed in world units per second.
         """
+        if self.timeBased:
+            self.linearCommand -= velocity
+            return
         robot_position_x, robot_position_y, robot_heading = self.agent.get_position()
 
         direction_x = math.sin(math.radians(robot_heading))
@@ -86,12 +129,17 @@ class Actuation():
         self.agent.set_position(new_position_x, new_position_y, robot_heading)
 
     def turn_right(self, angle_velocity):
-
+        if self.timeBased:
+            self.turnCommand -= angle_velocity      # degrees per second
+            return
         robot_position_x, robot_position_y, robot_heading = self.agent.get_position()
         new_angle = (robot_heading - angle_velocity) % 360
         self.agent.set_position(robot_position_x, robot_position_y, new_angle)
 
     def turn_left(self,angle_velocity):
+        if self.timeBased:
+            self.turnCommand += angle_velocity      # degrees per second
+            return
         # new angle
         robot_position_x, robot_position_y, robot_heading = self.agent.get_position()
         new_angle = (robot_heading + angle_velocity) % 360
@@ -101,12 +149,15 @@ class Actuation():
         
     def processUserInput(self, pressedKeys):
         """
-        Process user keyboard input.
+        Process user keyboard input, called for the teleoperated agent only (see processing.py).
         
         Args:
             pressedKeys (Pygame Keyboard Codes)
         
         """
+        if not pressedKeys:
+            return                      # headless run, no keyboard (and no pygame)
+        import pygame
         if pressedKeys[pygame.K_UP]:           
             self.stepForward(self.config['default_velocity'])
             
@@ -12,13 +12,13 @@ This module represents an agent in the environment.
 # =============================================================================
 # Imports
 # =============================================================================
+import random
 from .perception import Perception
 #from my_sensors import MySensor
 #from .actuation import Actuation
 from .body import Body
 from .processing import Processing
 from abc import abstractmethod
-import pygame
 #from .actuation import Actuation
 #from my_controller import MyController
 
@@ -40,6 +40,7 @@ class Agent():
         processing  (processing.py):   represents the processing capabilites
         perception  (perception.py):   represents the sensing capabilities
         actuation   (actuation.py):    represents the actuator capabilites
+        random      (random.Random):   random generator of this agent, re-seeded every timestep in seeded runs
     """
     def __init__(self,e,controller, sensor, config):
         """
@@ -48,11 +49,17 @@ class Agent():
         # environment and other objects. This variables are only needed for simulation calculations and are not needed from the agents point of view
         self.environment = e
         self.unique_id = None
+        self.random = random.Random(random.getrandbits(64))    # drawn from by controllers and sensors, derived from the seeded random module
         # instantiate agent parts
         self.body = Body(self)
         self.perception = []
+        sensor_periods = config.get('sensor_periods') or {}
         for i in range(len(sensor)):
             self.perception.append(sensor[i](self, e, config))   #   MySensor(self, e)
+            if sensor[i].__name__ in sensor_periods:
+                self.perception[-1].update_period = sensor_periods[sensor[i].__name__]
+        self.perceptionStep = None      # timestep of the cached sensor values
+        self.perceptionValues = None
         ##self.perception = sensor(self, e, config)   #   MySensor(self, e)
         self.actuation = controller(self, config)   #MyController(self, p, d)
         self.processing = Processing(self)
@@ -87,28 +94,67 @@ class Agent():
         Get the x-y position and direction unit vector of the agent.
         Returns:
         """
-        x, y, gamma = self.actuation.position[0], self.actuation.position[1], self.actuation.angle
-        return x,y, gamma
+        slot = self.actuation.slot
+        position = self.environment.agent_positions
+        return position[slot, 0], position[slot, 1], self.environment.agent_headings[slot]
 
     def set_position(self, x: float, y: float, gamma:float):
         """
         Set the x-y position and direction unit vector of the agent.
         """
-        self.actuation.position[0] = x
-        self.actuation.position[1] = y
-        self.actuation.angle = gamma
+        slot = self.actuation.slot
+        position = self.environment.agent_positions
+        position[slot, 0] = x
+        position[slot, 1] = y
+        self.environment.agent_headings[slot] = gamma
         #self.environment.add_dynamic_circle_object([(0, 0, 255), (x, y), 20, 1])
         #self.environment.add_dynamic_rectangle_object(['BLACK', pygame.Rect(x-15, y-15, 30, 30),5])
 
+    def get_state(self):
+        """
+        Collect the internal state of the agent parts (e.g. controller counters), 
+        so that the agent can be continued by another copy of the simulation.
+        Position and heading are not included, they live in the swarm arrays.
+
+        Returns: picklable dict
+        """
+        return {'agent': _own_state(self),
+                'actuation': _own_state(self.actuation),
+                'perception': [_own_state(sensor) for sensor in self.perception]}
+
+    def set_state(self, state):
+        """
+        Restore a state collected with get_state().
+        """
+        vars(self).update(state['agent'])
+        vars(self.actuation).update(state['actuation'])
+        for sensor, sensor_state in zip(self.perception, state['perception']):
+            vars(sensor).update(sensor_state)
+
     def get_perception(self):
+        """
+        Get the values of all sensors, [unique_id, sensor_1, sensor_2, ...].
+        The values are cached for the current timestep.
+        """
+        if self.perceptionStep == self.environment.timestep and self.perceptionValues is not None:
+            return self.perceptionValues
         sensor_values = [self.unique_id]
         for sensor in self.perception:
-            sensor_values.append(sensor.sensor())
+            sensor_values.append(sensor.read())
+        self.perceptionStep = self.environment.timestep
+        self.perceptionValues = sensor_values
         return sensor_values
 
 
+# =============================================================================
+# Helper functions
+# =============================================================================
+# references to other simulation objects and shared data, never part of an agent state
+_SHARED_ATTRIBUTES = frozenset(('agent', 'environment', 'env', 'e', 'config', 'position', 'heading',
+                                'body', 'perception', 'actuation', 'processing'))
 
-
-
-
-
+def _own_state(obj):
+    """
+    Returns: the attributes of obj that are owned by this agent
+    """
+    return {k: v for k, v in vars(obj).items() if k not in _SHARED_ATTRIBUTES}
@@ -12,12 +12,12 @@ This module represents the body of an agent.
 # =============================================================================
 # Imports and Variables
 # =============================================================================
-import pygame
-import math
 import numpy as np
 
 # Helper variable
-polyRotatedLookUp = [] # the table reduces computation steps to improves rendering speed
+DEFAULT_COLOR = (0,90,90)                       # turquoise, shared until a body is recolored
+LUT_BINS = 360                                  # heading resolution of the lookup table (1 degree)
+polyRotatedLookUp = np.zeros((0, 20, 2))        # (LUT_BINS, 20, 2) rotated reference polygons, row k is rotated by k degrees
 
 # =============================================================================
 # Class
@@ -26,71 +26,57 @@ class Body():
     """
     The body is the visual representation of an agent in the simulation.    
     The object defines the dimensions and the position of an agent in the environment.
+    The reference polygon is shared by all bodies, a body only holds its color and current polygon.
     
     Args:
         a (agent.py): instance of the agent
         p ([int, int]): initial center position
     """
+    # constants (shared by all bodies)
+    WIDTH = 24                      # agent body width
+    HEIGHT = 10                     # agent body height
+    BOUNDING = round(np.hypot(WIDTH, HEIGHT))+20
+
+    __slots__ = ('agent', 'polyCur', 'COLOR')
+
     def __init__(self, a):
         """
         Initialize body object.
-        """    
-        super(Body, self).__init__()
-        
-        # constants
-        self.WIDTH = 24                 # agent body width
-        self.HEIGHT = 10                # agent body height
-        self.COLOR = (0,90,90)          # turquoise
-        self.BOUNDING = round(np.hypot(self.WIDTH, self.HEIGHT))+20
-        
+        """
         # variables
         self.agent = a
-        
-        # initial position with agent center in coordinate system origin
-        wheelDist = 8        # helper variable to calculate the agent body
-        motorDist = 3        # helper variable to calculate the agent body
-        ratioBodyWheel = 6   # helper variable to calculate the agent body  
-        v1 = pygame.Vector2(-self.WIDTH/ratioBodyWheel/2-self.WIDTH/2-wheelDist, -self.HEIGHT*2/2)  
-        v2 = pygame.Vector2(self.WIDTH/ratioBodyWheel/2-self.WIDTH/2-wheelDist, -self.HEIGHT*2/2)
-        v3 = pygame.Vector2(self.WIDTH/ratioBodyWheel/2-self.WIDTH/2-wheelDist, -self.HEIGHT/2+motorDist)
-        v4 = pygame.Vector2(-self.WIDTH/2, -self.HEIGHT/2+motorDist)  
-        v5 = pygame.Vector2(-self.WIDTH/2, -self.HEIGHT/2)        
-        v6 = pygame.Vector2(self.WIDTH/2, -self.HEIGHT/2)
-        v7 = pygame.Vector2(self.WIDTH/2, -self.HEIGHT/2+motorDist)
-        v8 = pygame.Vector2(-self.WIDTH/ratioBodyWheel/2+self.WIDTH/2+wheelDist, -self.HEIGHT/2+motorDist) 
-        v9 = pygame.Vector2(-self.WIDTH/ratioBodyWheel/2+self.WIDTH/2+wheelDist, -self.HEIGHT*2/2)
-        v10 = pygame.Vector2(self.WIDTH/ratioBodyWheel/2+self.WIDTH/2+wheelDist, -self.HEIGHT*2/2)
-        v11 = pygame.Vector2(self.WIDTH/ratioBodyWheel/2+self.WIDTH/2+wheelDist, self.HEIGHT*2/2)
-        v12 = pygame.Vector2(-self.WIDTH/ratioBodyWheel/2+self.WIDTH/2+wheelDist, self.HEIGHT*2/2)  
-        v13 = pygame.Vector2(-self.WIDTH/ratioBodyWheel/2+self.WIDTH/2+wheelDist, self.HEIGHT/2-motorDist)
-        v14 = pygame.Vector2(self.WIDTH/2, self.HEIGHT/2-motorDist)
-        v15 = pygame.Vector2(self.WIDTH/2, self.HEIGHT/2)
-        v16 = pygame.Vector2(-self.WIDTH/2, self.HEIGHT/2)        
-        v17 = pygame.Vector2(-self.WIDTH/2, self.HEIGHT/2-motorDist)
-        v18 = pygame.Vector2(self.WIDTH/ratioBodyWheel/2-self.WIDTH/2-wheelDist, self.HEIGHT/2-motorDist)
-        v19 = pygame.Vector2(self.WIDTH/ratioBodyWheel/2-self.WIDTH/2-wheelDist, self.HEIGHT*2/2)
-        v20 = pygame.Vector2(-self.WIDTH/ratioBodyWheel/2-self.WIDTH/2-wheelDist, self.HEIGHT*2/2)
-        
-        self.polyRef = [v1,v2,v3,v4,v5,v6,v7,v8,v9,v10,v11,v12,v13,v14,v15,v16,v17,v18,v19,v20]  # coordinates for reference polygon
-        self.polyCur = []             # coordinates for current polygon
-  
-        # init bounding rect
-        self.rect = pygame.Rect(0, 0, self.BOUNDING, self.BOUNDING)
-        self.rect.centerx = 0#p[0]
-        self.rect.centery = 0#p[1]
-           
-        
+        self.COLOR = DEFAULT_COLOR
+        self.polyCur = None             # (20, 2) coordinates for current polygon
+
+    @property
+    def polyRef(self):
+        """
+        (20, 2) coordinates of the reference polygon, one array shared by all bodies
+        """
+        return POLY_REF
+
+    @property
+    def rect(self):
+        """
+        Bounding rect around the current agent position
+        """
+        import pygame
+        rect = pygame.Rect(0, 0, self.BOUNDING, self.BOUNDING)
+        if self.agent is not None:
+            x, y, _ = self.agent.get_position()
+            rect.center = (round(x), round(y))
+        return rect
+
 #%% Rendering and Helper functions
     
     def render(self):
         """
         Render body orientation and position & Update token
         """ 
-        global polyRotatedLookUp
-        self.polyCur = []
+        if len(polyRotatedLookUp) == 0:
+            self.helperLUT()
         # use precalculated rotations and add position vector
-        for p in polyRotatedLookUp[self.agent.actuation.angle-1]:
-            self.polyCur.append(p + self.agent.actuation.position)
+        self.polyCur = polyRotatedLookUp[heading_bins(self.agent.actuation.angle)] + self.agent.actuation.position
         self.agent.environment.dynamicPolyList.append([self.COLOR, self.polyCur, 3])
 
         # --- Old Approach without lookup table ---
@@ -113,30 +99,100 @@ class Body():
         """
         Calculates a lookup table for the rotation of an agent to improve rendering performance.
         The lookup table is not relevant for logic performance (when simulating without drawing on a display).
-        The results are stored in a global variable, so that the calculation has only to be performed once.
+        The results are stored in a global (LUT_BINS, 20, 2) array, so that the calculation has only to be performed once.
         """         
         global polyRotatedLookUp
-        for x in range(360):
-            ang = math.radians(x+1)
-            turnMat = [[np.cos(ang),-np.sin(ang)],[np.sin(ang),np.cos(ang)]]
-            
-            self.polyCur = []
-            for p in self.polyRef:
-                self.polyCur.append(np.matmul(p,turnMat) + ([int(0), int(0)]))
-            polyRotatedLookUp.append(self.polyCur)
-            
-            
-            
-            
-            
-            
-            
-            
-            
-            
-            
-            
-            
-            
-            
-            
\ No newline at end of file
+        ang = np.radians(np.arange(LUT_BINS) * (360 / LUT_BINS))
+        cos, sin = np.cos(ang), np.sin(ang)
+        turnMat = np.empty((LUT_BINS, 2, 2))
+        turnMat[:, 0, 0], turnMat[:, 0, 1] = cos, -sin
+        turnMat[:, 1, 0], turnMat[:, 1, 1] = sin, cos
+        # row vector times rotation matrix for all vertices and all headings at once
+        polyRotatedLookUp = np.ascontiguousarray(np.einsum('vi,kij->kvj', POLY_REF, turnMat))
+
+# =============================================================================
+# Helper functions
+# =============================================================================
+def reference_polygon(width, height):
+    """
+    Body outline (two wheels and the chassis) with the agent center in the coordinate system origin.
+
+    Returns: (20, 2) array of vertices
+    """
+    wheelDist = 8        # helper variable to calculate the agent body
+    motorDist = 3        # helper variable to calculate the agent body
+    ratioBodyWheel = 6   # helper variable to calculate the agent body
+    return np.array([
+        (-width/ratioBodyWheel/2-width/2-wheelDist, -height*2/2),
+        (width/ratioBodyWheel/2-width/2-wheelDist, -height*2/2),
+        (width/ratioBodyWheel/2-width/2-wheelDist, -height/2+motorDist),
+        (-width/2, -height/2+motorDist),
+        (-width/2, -height/2),
+        (width/2, -height/2),
+        (width/2, -height/2+motorDist),
+        (-width/ratioBodyWheel/2+width/2+wheelDist, -height/2+motorDist),
+        (-width/ratioBodyWheel/2+width/2+wheelDist, -height*2/2),
+        (width/ratioBodyWheel/2+width/2+wheelDist, -height*2/2),
+        (width/ratioBodyWheel/2+width/2+wheelDist, height*2/2),
+        (-width/ratioBodyWheel/2+width/2+wheelDist, height*2/2),
+        (-width/ratioBodyWheel/2+width/2+wheelDist, height/2-motorDist),
+        (width/2, height/2-motorDist),
+        (width/2, height/2),
+        (-width/2, height/2),
+        (-width/2, height/2-motorDist),
+        (width/ratioBodyWheel/2-width/2-wheelDist, height/2-motorDist),
+        (width/ratioBodyWheel/2-width/2-wheelDist, height*2/2),
+        (-width/ratioBodyWheel/2-width/2-wheelDist, height*2/2)])
+
+
+POLY_REF = reference_polygon(Body.WIDTH, Body.HEIGHT)
+POLY_REF.flags.writeable = False
+BODY_REACH = float(np.hypot(POLY_REF[:, 0], POLY_REF[:, 1]).max())     # farthest vertex from the agent center
+
+
+def heading_bins(angles):
+    """
+    Map headings in degrees (int or float, any range) to the nearest row of the lookup table.
+
+    Args:
+        angles (float or np.ndarray): headings in degrees
+    Returns: lookup table row index (same shape as angles)
+    """
+    return np.rint(np.asarray(angles) * (LUT_BINS / 360)).astype(np.intp) % LUT_BINS
+
+
+def swarm_polygons(positions, angles):
+    """
+    World-space body polygons of many agents at once.
+
+    Args:
+        positions (np.ndarray): (N, 2) agent x-y positions
+        angles (np.ndarray): (N,) agent headings in degrees
+    Returns: (N, 20, 2) array of polygon vertices
+    """
+    if len(polyRotatedLookUp) == 0:
+        Body(None).helperLUT()
+    return polyRotatedLookUp[heading_bins(angles)] + positions[:, None, :]
+
+
+def points_in_polygons(polygons, points):
+    """
+    Exact even-odd point in polygon test, vectorized over polygon/point pairs.
+    Works for the non-convex body outline.
+
+    Args:
+        polygons (np.ndarray): (..., V, 2) polygon vertices, e.g. from swarm_polygons
+        points (np.ndarray): (..., 2) query points, broadcast against the polygons
+    Returns: (...) boolean array, True where the point lies inside its polygon
+    """
+    px = np.asarray(points, dtype=float)[..., 0, None]
+    py = np.asarray(points, dtype=float)[..., 1, None]
+    x1, y1 = polygons[..., 0], polygons[..., 1]
+    x2, y2 = np.roll(x1, -1, axis=-1), np.roll(y1, -1, axis=-1)
+
+    # edges straddling the horizontal ray through the point, crossing right of it
+    straddle = (y1 > py) != (y2 > py)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+    crossings = np.count_nonzero(straddle & (px < x_cross), axis=-1)
+    return crossings % 2 == 1
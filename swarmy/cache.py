@@ -0,0 +1,162 @@
+"""
+Description:
+This module caches experiment results on disk.
+A result is stored under a hash of everything that determines it: the config,
+the seed, the source code of the swarmy package and the source code of the modules
+defining the controller, sensor, world and agent classes, their base classes and the
+stop conditions (whole modules, so module-level helpers are covered). Changing any
+of them gives a new key, so outdated results are never returned.
+Only seeded runs are cached, unseeded runs are not reproducible.
+The output files of a run (trajectory recording, metrics and coverage exports) are
+stored with the result and written again when the result is loaded.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import glob
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+
+_package_digest = None      # hash of the swarmy sources, computed once per process
+
+# =============================================================================
+# Class
+# =============================================================================
+class ResultCache():
+    """
+    Content-addressed store of ExperimentResult objects.
+
+    Args:
+        directory (str): cache directory, created on first store
+    """
+    def __init__(self, directory):
+        """
+        Initialize cache object.
+        """
+        self.directory = directory
+
+    def key(self, experiment):
+        """
+        Compute the key before the run, stop conditions change their state while running.
+
+        Returns: hex digest identifying the result of the experiment
+        """
+        h = hashlib.sha256()
+        h.update(json.dumps(experiment.config, sort_keys=True, default=repr).encode())
+        h.update(repr(experiment.seed).encode())
+        h.update(_package_source_digest())
+        classes = (list(experiment.agent_controller) + list(experiment.agent_sensing)
+                   + [type(experiment.world), experiment.agent])
+        for cls in classes:
+            h.update(_class_source(cls).encode())
+        for condition in experiment.stop_conditions:
+            h.update(_object_source(condition).encode())
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.pkl')
+
+    def load(self, key):
+        """
+        Load a result and write its output files again.
+
+        Returns: cached ExperimentResult or None
+        """
+        try:
+            with open(self.path(key), 'rb') as file:
+                entry = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if not isinstance(entry, dict) or 'result' not in entry:
+            return None                     # entry of an older version
+        for path, content in entry['files'].items():
+            with open(path, 'wb') as file:
+                file.write(content)
+        return entry['result']
+
+    def store(self, key, result, files=()):
+        """
+        Save a result and the output files of its run, the entry is written atomically so parallel sweeps can share the cache.
+
+        Args:
+            key (str): key of the experiment (see key)
+            result (ExperimentResult): result of the run
+            files ([str]): output files written by the run
+        """
+        contents = {}
+        for name in files:
+            with open(name, 'rb') as file:
+                contents[name] = file.read()
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'wb') as file:
+            pickle.dump({'result': result, 'files': contents}, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+
+# =============================================================================
+# Helper functions
+# =============================================================================
+def _package_source_digest():
+    """
+    Returns: digest of all source files of the swarmy package
+    """
+    global _package_digest
+    if _package_digest is None:
+        h = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+            h.update(os.path.basename(path).encode())
+            with open(path, 'rb') as file:
+                h.update(file.read())
+        _package_digest = h.digest()
+    return _package_digest
+
+
+def _module_source(obj):
+    """
+    Returns: source code of the module defining a class or function, the qualified name if it has none
+    """
+    name = getattr(obj, '__module__', None)
+    module = sys.modules.get(name)
+    try:
+        return inspect.getsource(module)
+    except (OSError, TypeError):
+        return '{}.{}'.format(name, getattr(obj, '__qualname__', repr(obj)))
+
+
+def _class_source(cls):
+    """
+    Returns: source code of the modules defining a class and all its base classes (except builtins)
+    """
+    parts = []
+    for base in cls.__mro__:
+        if base.__module__ == 'builtins':
+            continue
+        source = _module_source(base)
+        if source not in parts:
+            parts.append(source)
+    return '\n'.join(parts)
+
+
+def _object_source(obj):
+    """
+    Returns: class source and settings of an object, callables are described by their source and module
+    """
+    parts = [_class_source(type(obj))]
+    for name, value in sorted(vars(obj).items()):
+        if callable(value):
+            try:
+                source = inspect.getsource(value)
+            except (OSError, TypeError):
+                source = getattr(value, '__qualname__', repr(type(value)))
+            value = source + _module_source(value)
+        elif not isinstance(value, (int, float, str, bool, type(None), tuple, list, dict)):
+            continue    # runtime state, e.g. buffers of the condition
+        parts.append('{}={}'.format(name, value))
+    return '\n'.join(parts)
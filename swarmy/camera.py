@@ -0,0 +1,150 @@
+"""
+Description:
+This module represents the camera (viewport) through which the environment is rendered.
+The camera maps world coordinates to screen coordinates and supports pan and zoom,
+so that worlds much larger than the screen can be displayed.
+
+Controls:
+    W, A, S, D          pan
+    mouse wheel         zoom at the mouse position
+    middle mouse drag   pan
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import numpy as np
+
+# =============================================================================
+# Class
+# =============================================================================
+class Camera():
+    """
+    Viewport on the world.
+
+    Args:
+        screen_w (int): width of the display surface in pixels
+        screen_h (int): height of the display surface in pixels
+        world_w (int): world width in pixels
+        world_h (int): world height in pixels
+    """
+    def __init__(self, screen_w, screen_h, world_w, world_h):
+        """
+        Initialize camera object.
+        """
+        # constants
+        self.PAN_SPEED = 15             # screen pixels per frame when panning with the keyboard
+        self.ZOOM_STEP = 1.1            # zoom factor per mouse wheel tick
+
+        # variables
+        self.screen_w = screen_w
+        self.screen_h = screen_h
+        self.world_w = world_w
+        self.world_h = world_h
+        self.x = 0.0                    # world coordinate shown at the left screen border
+        self.y = 0.0                    # world coordinate shown at the top screen border
+        self.zoom = 1.0                 # screen pixels per world pixel
+        self.min_zoom = min(1.0, screen_w / world_w, screen_h / world_h)
+        self.max_zoom = 8.0
+
+    def is_identity(self):
+        """
+        Returns: True if world and screen coordinates coincide
+        """
+        return self.zoom == 1.0 and self.x == 0.0 and self.y == 0.0
+
+    def view_rect(self):
+        """
+        Returns: visible world rectangle as (x0, y0, x1, y1)
+        """
+        return (self.x, self.y, self.x + self.screen_w / self.zoom, self.y + self.screen_h / self.zoom)
+
+    def clamp(self):
+        """
+        Keep the view inside the world, a world smaller than the view is pinned to the origin.
+        """
+        self.x = min(max(self.x, 0.0), max(0.0, self.world_w - self.screen_w / self.zoom))
+        self.y = min(max(self.y, 0.0), max(0.0, self.world_h - self.screen_h / self.zoom))
+
+    def pan(self, dx, dy):
+        """
+        Move the view by (dx, dy) screen pixels.
+        """
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+        self.clamp()
+
+    def zoom_at(self, factor, screen_pos):
+        """
+        Change the zoom while keeping the world point under screen_pos fixed.
+        """
+        wx, wy = self.to_world(screen_pos)
+        self.zoom = min(max(self.zoom * factor, self.min_zoom), self.max_zoom)
+        self.x = wx - screen_pos[0] / self.zoom
+        self.y = wy - screen_pos[1] / self.zoom
+        self.clamp()
+
+    def resize(self, screen_w, screen_h):
+        """
+        Adapt the camera to a new display size.
+        """
+        self.screen_w = screen_w
+        self.screen_h = screen_h
+        self.min_zoom = min(1.0, screen_w / self.world_w, screen_h / self.world_h)
+        self.zoom = max(self.zoom, self.min_zoom)
+        self.clamp()
+
+#%% Coordinate transforms
+
+    def to_world(self, screen_pos):
+        """
+        Returns: world coordinates of a screen position
+        """
+        return (self.x + screen_pos[0] / self.zoom, self.y + screen_pos[1] / self.zoom)
+
+    def to_screen(self, points):
+        """
+        Transform one point or an array of points to screen coordinates.
+
+        Args:
+            points (array_like): (..., 2) world coordinates
+        Returns: np.ndarray with the same shape
+        """
+        return (np.asarray(points, dtype=float) - (self.x, self.y)) * self.zoom
+
+    def rect_to_screen(self, rect):
+        """
+        Returns: pygame.Rect of a world rectangle in screen coordinates
+        """
+        import pygame
+        z = self.zoom
+        return pygame.Rect(round((rect.left - self.x) * z), round((rect.top - self.y) * z),
+                           max(1, round(rect.width * z)), max(1, round(rect.height * z)))
+
+#%% User input
+
+    def handle_event(self, event):
+        """
+        Process one pygame event (mouse wheel, middle mouse drag, window resize).
+        """
+        import pygame
+        if event.type == pygame.MOUSEWHEEL:
+            factor = self.ZOOM_STEP if event.y > 0 else 1 / self.ZOOM_STEP
+            self.zoom_at(factor, pygame.mouse.get_pos())
+        elif event.type == pygame.MOUSEMOTION and event.buttons[1]:
+            self.pan(-event.rel[0], -event.rel[1])
+        elif event.type == pygame.VIDEORESIZE:
+            self.resize(event.w, event.h)
+
+    def processUserInput(self, pressedKeys):
+        """
+        Pan with the W, A, S, D keys.
+
+        Args:
+            pressedKeys (Pygame Keyboard Codes)
+        """
+        import pygame
+        dx = (pressedKeys[pygame.K_d] - pressedKeys[pygame.K_a]) * self.PAN_SPEED
+        dy = (pressedKeys[pygame.K_s] - pressedKeys[pygame.K_w]) * self.PAN_SPEED
+        if dx or dy:
+            self.pan(dx, dy)
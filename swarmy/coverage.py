@@ -0,0 +1,83 @@
+"""
+Description:
+This module tracks how much of the arena has been visited by the swarm.
+The world is divided into square cells and every timestep the cells under
+all agents are incremented with one vectorized scatter-add.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import math
+import numpy as np
+
+# =============================================================================
+# Class
+# =============================================================================
+class Coverage():
+    """
+    Visit-count grid (occupancy heatmap) of the environment.
+
+    Args:
+        width (int): world width in pixels
+        height (int): world height in pixels
+        cell_size (int): edge length of one grid cell in pixels
+    """
+    def __init__(self, width, height, cell_size):
+        """
+        Initialize coverage object.
+        """
+        self.cell_size = cell_size
+        self.cols = math.ceil(width / cell_size)
+        self.rows = math.ceil(height / cell_size)
+
+        self.visits = np.zeros(self.rows * self.cols, dtype=np.int64)    # flat visit counts
+        self.covered_cells = 0                                           # cells with at least one visit
+        self.history = []                                                # coverage fraction per update
+
+    def update(self, positions):
+        """
+        Add one visit for every agent position.
+
+        Args:
+            positions (np.ndarray): (N, 2) array of agent x-y positions
+        """
+        cx = np.clip((positions[:, 0] // self.cell_size).astype(np.intp), 0, self.cols - 1)
+        cy = np.clip((positions[:, 1] // self.cell_size).astype(np.intp), 0, self.rows - 1)
+        cells = cy * self.cols + cx
+
+        # cells entered for the first time, duplicates removed before counting
+        first = cells[self.visits[cells] == 0]
+        if first.size:
+            self.covered_cells += np.unique(first).size
+
+        np.add.at(self.visits, cells, 1)
+        self.history.append(self.covered_cells / self.visits.size)
+
+    def fraction(self):
+        """
+        Returns: fraction of cells visited at least once
+        """
+        return self.covered_cells / self.visits.size
+
+    def fraction_over_time(self):
+        """
+        Returns: (T,) array with the coverage fraction after every update
+        """
+        return np.asarray(self.history)
+
+    def heatmap(self):
+        """
+        Returns: (rows, cols) view of the visit counts, row index is y
+        """
+        return self.visits.reshape(self.rows, self.cols)
+
+    def save(self, path):
+        """
+        Export the final heatmap and the coverage curve as a .npz file.
+
+        Args:
+            path (str): output file name
+        """
+        np.savez_compressed(path, heatmap=self.heatmap(), coverage=self.fraction_over_time(),
+                            cell_size=self.cell_size)
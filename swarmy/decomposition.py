@@ -0,0 +1,274 @@
+"""
+Description:
+This module splits one experiment across several processes (spatial domain decomposition).
+The world is cut into vertical tiles, each tile is owned by one worker process that
+updates the agents inside it. The tile borders are the x quantiles of the swarm,
+recomputed every timestep, so every worker updates about the same number of agents
+also when the swarm aggregates. Poses and items are kept in shared memory; a worker
+only indexes the agents within halo_width of the x range of its own agents.
+An agent may still jump anywhere within a timestep (e.g. initial_position() in a
+controller): a query beyond the halo makes the worker index all agents for the rest
+of the timestep, so it senses the same agents as in a serial run.
+An agent that leaves a tile migrates: its controller and sensor state is handed
+to the worker of the new tile.
+
+With a seed in config.yaml the random generator of every agent is re-seeded per timestep
+(see experiment.step_agents), so a decomposed run gives the same result as a serial one.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+# =============================================================================
+# Class
+# =============================================================================
+class TileDecomposition():
+    """
+    Coordinator of the tile worker processes, lives in the main process.
+
+    Args:
+        experiment (experiment.py): experiment to decompose
+        environment (environment.py): environment of the main process
+        processes (int): number of tiles (worker processes)
+    """
+    def __init__(self, experiment, environment, processes):
+        """
+        Initialize decomposition and start the workers.
+        """
+        self.environment = environment
+        self.processes = processes
+        n_agents = environment.agent_count
+        n_items = len(environment.items)
+
+        # move the swarm arrays and the item arrays into shared memory
+        self.shm = SharedMemory(create=True, size=max(1, _shared_size(n_agents, n_items)))
+        positions, headings, self.snapshot, self.headingSnapshot, item_positions, item_carrier = \
+            _shared_views(self.shm, n_agents, n_items)
+        positions[:] = environment.get_agent_positions()
+        headings[:] = environment.get_agent_headings()
+        item_positions[:] = environment.items.positions
+        item_carrier[:] = environment.items.carrier
+        environment.attach_state_arrays(positions, headings)
+        environment.items.positions = item_positions
+        environment.items.carrier = item_carrier
+
+        # agent states waiting for their new tile
+        self.inbox = [[] for _ in range(processes)]
+        self.bounds = _tile_bounds(positions[:, 0], processes, environment.width)
+
+        spec = (experiment.config, experiment.agent_controller, experiment.agent_sensing,
+                type(experiment.world), experiment.agent)
+        ctx = multiprocessing.get_context()
+        self.connections = []
+        self.workers = []
+        for tile in range(processes):
+            parent_conn, child_conn = ctx.Pipe()
+            worker = ctx.Process(target=_tile_worker, args=(tile, self.bounds, child_conn, self.shm.name,
+                                                            n_agents, n_items, spec), daemon=True)
+            worker.start()
+            self.connections.append(parent_conn)
+            self.workers.append(worker)
+        for conn in self.connections:
+            conn.recv()                                 # wait until all workers are ready
+
+    def step(self, timestep, pressedKeys):
+        """
+        Update all agents for one timestep, one tile per worker.
+        """
+        keys = frozenset(k for k in _teleop_keys() if pressedKeys[k]) if pressedKeys else frozenset()
+        # poses at the beginning of the timestep, read by all workers while the live poses change
+        self.snapshot[:] = self.environment.get_agent_positions()
+        self.headingSnapshot[:] = self.environment.get_agent_headings()
+        # tiles of equal agent count, agents outside of their new tile migrate after this timestep
+        self.bounds = _tile_bounds(self.snapshot[:, 0], self.processes, self.environment.width)
+        for tile, conn in enumerate(self.connections):
+            conn.send(('step', timestep, keys, self.inbox[tile], self.bounds))
+        self.inbox = [[] for _ in range(self.processes)]
+        for conn in self.connections:
+            for slot, tile, state in conn.recv():
+                self.inbox[tile].append((slot, state))
+
+    def finish(self, agentList):
+        """
+        Collect the final agent states, stop the workers and release the shared memory.
+        """
+        for tile, conn in enumerate(self.connections):
+            conn.send(('finish', None, None, self.inbox[tile], None))
+        for conn in self.connections:
+            for slot, state in conn.recv():
+                agentList[slot].set_state(state)
+        for worker in self.workers:
+            worker.join()
+
+        # keep private copies in the main process before the shared block disappears
+        environment = self.environment
+        environment.attach_state_arrays(environment.agent_positions.copy(), environment.agent_headings.copy())
+        environment.items.positions = environment.items.positions.copy()
+        environment.items.carrier = environment.items.carrier.copy()
+        self.shm.close()
+        self.shm.unlink()
+
+
+# =============================================================================
+# Worker
+# =============================================================================
+def _teleop_keys():
+    """
+    Returns: keys that are forwarded to the workers for the keyboard controlled agents
+    """
+    import pygame
+    return (pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT)
+
+class _PressedKeys():
+    """
+    Stand-in for pygame.key.get_pressed() in the worker processes.
+    """
+    def __init__(self, keys):
+        self.keys = keys
+
+    def __getitem__(self, key):
+        return key in self.keys
+
+    def __bool__(self):
+        return bool(self.keys)
+
+
+def _tile_worker(tile, bounds, conn, shm_name, n_agents, n_items, spec):
+    """
+    Worker process: owns the agents inside one tile.
+    The worker builds its own copy of the simulation (same seed, same world) and
+    attaches it to the shared arrays.
+    """
+    from .experiment import Experiment, step_agents
+
+    config, agent_controller, agent_sensing, world, agent = spec
+    experiment = Experiment(config, agent_controller, agent_sensing, world, agent)
+    environment = experiment.world
+    agentList = experiment.create_agents(environment)
+
+    shm = SharedMemory(name=shm_name)
+    positions, headings, snapshot, heading_snapshot, item_positions, item_carrier = _shared_views(shm, n_agents, n_items)
+    environment.attach_state_arrays(positions, headings)
+    environment.items.positions = item_positions
+    environment.items.carrier = item_carrier
+
+    halo = config.get('halo_width', 160)
+    all_items = np.arange(n_items)
+
+    def tile_of(x):
+        return np.searchsorted(bounds[1:-1], x, side='right')
+
+    owned = np.flatnonzero(tile_of(positions[:, 0]) == tile)
+    conn.send('ready')
+
+    while True:
+        command, timestep, keys, arrivals, bounds = conn.recv()
+        for slot, state in arrivals:
+            agentList[slot].set_state(state)
+        if arrivals:
+            owned = np.union1d(owned, [slot for slot, _ in arrivals])
+        if command == 'finish':
+            conn.send([(slot, agentList[slot].get_state()) for slot in owned.tolist()])
+            break
+
+        # consistent snapshot, only the agents around the own agents are indexed
+        environment.timestep = timestep
+        ids, cover = _halo(snapshot[owned, 0], snapshot[:, 0], halo, environment.width, environment.torus)
+        environment.agentGrid.build(snapshot, ids, cover)
+        environment.headingSnapshot = heading_snapshot
+        environment.neighborCache = {}
+        environment.agent_object_list = None
+        environment.items.reindex(all_items)
+
+        stepped = [agentList[slot] for slot in owned.tolist()]
+        step_agents(stepped, _PressedKeys(keys), timestep, experiment.seed)
+        if environment.integrator is not None:
+            environment.integrator.step(stepped)
+
+        # wrap and hand over agents that left the tile
+        if environment.torus:
+            positions[owned] %= environment.worldSize
+        target = tile_of(positions[owned, 0])
+        leaving = target != tile
+        conn.send([(slot, new_tile, agentList[slot].get_state())
+                   for slot, new_tile in zip(owned[leaving].tolist(), target[leaving].tolist())])
+        owned = owned[~leaving]
+
+    shm.close()
+
+
+# =============================================================================
+# Helper functions
+# =============================================================================
+def _tile_bounds(x, processes, width):
+    """
+    Returns: (processes + 1,) tile borders on the x axis, every tile holds about the same number of agents
+    """
+    bounds = np.empty(processes + 1)
+    bounds[0], bounds[-1] = 0, width
+    if len(x) >= processes:
+        k = np.arange(1, processes) * len(x) // processes
+        bounds[1:-1] = np.partition(x, k)[k]
+    else:
+        bounds[1:-1] = np.arange(1, processes) * width / processes
+    return bounds
+
+
+def _halo(owned_x, x, halo, width, periodic):
+    """
+    Agents within halo of the x range of the own agents (shortest arc on a torus).
+
+    Args:
+        owned_x (np.ndarray): x coordinates of the agents of the tile
+        x (np.ndarray): x coordinates of all agents
+        halo (float): width of the band around the range
+        width (float): world width
+        periodic (bool): the world wraps around (torus topology)
+    Returns: indices of the agents to index and the covered x range (see SpatialGrid.build), None = all agents
+    """
+    if len(owned_x) == 0:
+        return np.zeros(0, dtype=np.intp), (0.0, 0.0)
+    if not periodic:
+        cover = (owned_x.min() - halo, owned_x.max() + halo)
+        return np.flatnonzero((x >= cover[0]) & (x <= cover[1])), cover
+    # the range starts after the largest gap between neighbouring agents on the circle
+    xs = np.sort(owned_x % width)
+    gaps = np.diff(xs, append=xs[0] + width)
+    g = int(np.argmax(gaps))
+    start = xs[(g + 1) % len(xs)]
+    end = xs[g] + (width if g + 1 < len(xs) else 0)
+    cover = (start - halo, end + halo)
+    if cover[1] - cover[0] >= width:
+        return None, None
+    return np.flatnonzero((x - cover[0]) % width <= cover[1] - cover[0]), cover
+
+
+def _shared_size(n_agents, n_items):
+    """
+    Returns: size in bytes of the shared block
+    """
+    return 8 * (6 * n_agents + 3 * n_items)
+
+
+def _shared_views(shm, n_agents, n_items):
+    """
+    Returns: positions (N, 2), headings (N,), position snapshot (N, 2), heading snapshot (N,),
+             item positions (M, 2) and item carriers (M,) in the shared block
+    """
+    offset = 0
+    positions = np.ndarray((n_agents, 2), dtype=np.float64, buffer=shm.buf, offset=offset)
+    offset += positions.nbytes
+    headings = np.ndarray((n_agents,), dtype=np.float64, buffer=shm.buf, offset=offset)
+    offset += headings.nbytes
+    snapshot = np.ndarray((n_agents, 2), dtype=np.float64, buffer=shm.buf, offset=offset)
+    offset += snapshot.nbytes
+    heading_snapshot = np.ndarray((n_agents,), dtype=np.float64, buffer=shm.buf, offset=offset)
+    offset += heading_snapshot.nbytes
+    item_positions = np.ndarray((n_items, 2), dtype=np.float64, buffer=shm.buf, offset=offset)
+    offset += item_positions.nbytes
+    item_carrier = np.ndarray((n_items,), dtype=np.int64, buffer=shm.buf, offset=offset)
+    return positions, headings, snapshot, heading_snapshot, item_positions, item_carrier
@@ -11,9 +11,17 @@ This module represents the physical environment.
 # =============================================================================
 # Imports
 # =============================================================================
-import pygame
 import numpy as np
 from abc import abstractmethod
+from .coverage import Coverage
+from .spatial import SpatialGrid, StaticGrid, radius_neighbors, nearest_neighbors
+from .camera import Camera
+from .body import swarm_polygons, points_in_polygons, BODY_REACH
+from .items import Items
+from .overlay import DebugOverlay
+from .integrator import Integrator
+from .pheromone import PheromoneField
+from .worldmap import load_world_map
 
 # =============================================================================
 # Class
@@ -22,7 +30,7 @@ class Environment():
     """
     The environment object represents the simulation world of an agent.
     It is the testbed where the experiments are conducted. 
-    The object expects that pygame is already initialized.
+    The object expects that pygame is already initialized, unless the run is headless (rendering = -1).
     
     Args:
         rendering (bolean): set simulation rendering on or off
@@ -48,27 +56,96 @@ class Environment():
         self.dynamicLineList = []
         self.dynamicRectList = []
         self.agentlist = []
+        self.timestep = 0           # current simulation timestep, set by the experiment
+        self.overlay = DebugOverlay()   # batched debug drawing (bumpers, rays), enabled by the experiment
+        self.population = None      # population manager, set by the experiment (see population.py)
         self.agent_object_list = []
         self.bumper_object_list = []
 
-        self.clock = pygame.time.Clock()  # create an object to help track time
+        # swarm state arrays, one row per agent (rows are shared with the actuation objects)
+        self.agent_positions = np.zeros((max(config['number_of_agents'], 1), 2))
+        self.agent_headings = np.zeros(max(config['number_of_agents'], 1))
+        self.agent_count = 0
+        self.slotOwners = []
+
+        # visit-count grid of the arena
+        self.coverage = None
+        if config.get('coverage_cell_size', 0) > 0:
+            self.coverage = Coverage(self.width, self.height, config['coverage_cell_size'])
+
+        # world topology: 'bounded' or 'torus' (positions wrap around the world borders)
+        self.torus = config.get('topology', 'bounded') == 'torus'
+
+        # pheromone field agents deposit into and sense from
+        self.pheromone = None
+        if config.get('pheromone_cell_size', 0) > 0:
+            self.pheromone = PheromoneField(self.width, self.height, config['pheromone_cell_size'],
+                                            config.get('pheromone_diffusion', 0.1), config.get('pheromone_evaporation', 0.01),
+                                            periodic=self.torus)
+        self.worldSize = np.array([self.width, self.height], dtype=float)
+
+        # spatial indices (agents are re-indexed every timestep, static objects once)
+        self.agentGrid = SpatialGrid(self.width, self.height, config.get('spatial_cell_size', 80), periodic=self.torus,
+                                     tuning_interval=config.get('spatial_tuning_interval', 25))
+        self.items = Items(self.width, self.height, config.get('spatial_cell_size', 80), periodic=self.torus)
+        self.headingSnapshot = np.zeros(0)
+        self.neighborCache = {}     # batch neighbour queries of the current snapshot
+        self.staticRectGrid = None
+        self.staticCircGrid = None
+        self.camera = None
+        self.pixelRenderer = None   # NumPy renderer (rendering = 2, see raster.py)
+
+        self.clock = None           # frame rate limiter, created by render_init() for displayed runs
+
+        # static walls from a map file (occupancy grid + merged rects, see worldmap.py)
+        self.worldMap = None
+        self.mapRects = range(0)    # indices of the map rects in staticRectList
+        if config.get('world_map'):
+            self.load_world_map(config['world_map'], config.get('world_map_cell_size', 10))
         self.add_static_rectangle_object()
         self.add_static_circle_object()
+        self.add_item_objects()
+
+        # fixed time step motion integration (dt > 0), else agents move in pixels per timestep
+        self.integrator = None
+        if config.get('dt', 0) > 0:
+            self.integrator = Integrator(self, config['dt'], config.get('max_step_distance', 17))
         ### SOLUTION LIGHT DISTRIBUTION ###
         #self.light_dist = np.zeros((self.width,self.height))
         #self.defineLight()
 
-    def render_init(self):
+    def render_init(self, rendering=None):
+        if rendering is None:
+            rendering = self.config['rendering']
+        if rendering in (-1, 2):
+            # headless or NumPy frame buffer, no display surface
+            self.displaySurface = None
+            self.camera = Camera(self.width, self.height, self.width, self.height)
+            self.build_static_index()
+            if rendering == 2:
+                from .raster import PixelRenderer
+                self.pixelRenderer = PixelRenderer(self)
+            return
+
+        import pygame
+        self.clock = pygame.time.Clock()  # create an object to help track time
+
+        # the window is at most as large as the display, larger worlds are viewed through the camera
+        info = pygame.display.Info()
+        screen_w = self.config.get('screen_width', min(self.width, info.current_w) if info.current_w > 0 else self.width)
+        screen_h = self.config.get('screen_height', min(self.height, info.current_h) if info.current_h > 0 else self.height)
+
         # init basic rendering surface
-        if(self.config['rendering']== 1):
-            if(self.width == pygame.display.Info().current_w and self.height == pygame.display.Info().current_h):   # fullscreen size
-                self.displaySurface = pygame.display.set_mode((self.width, self.height), pygame.FULLSCREEN)
+        if(rendering == 1):
+            if(screen_w == info.current_w and screen_h == info.current_h):                                         # fullscreen size
+                self.displaySurface = pygame.display.set_mode((screen_w, screen_h), pygame.FULLSCREEN)
             else:                                                                                                   # size smaller than fullscreen
-                self.displaySurface = pygame.display.set_mode((self.width, self.height), pygame.RESIZABLE)
-        elif(self.config['rendering'] == -1):
-            self.displaySurface = pygame.display.set_mode((self.width, self.height), pygame.HIDDEN)                 # no screen
-        elif(self.config['rendering'] == 0):
-            self.displaySurface = pygame.display.set_mode((self.width, self.height), pygame.NOFRAME)                # black screen where capture images is possible
+                self.displaySurface = pygame.display.set_mode((screen_w, screen_h), pygame.RESIZABLE)
+        elif(rendering == 0):
+            self.displaySurface = pygame.display.set_mode((screen_w, screen_h), pygame.NOFRAME)                    # black screen where capture images is possible
+
+        self.camera = Camera(screen_w, screen_h, self.width, self.height)
+        self.build_static_index()
 
 
     @abstractmethod
@@ -89,6 +166,14 @@ class Environment():
     def add_dynamic_circle_object(self,circle):
         self.dynamicCircList.append(circle)
 
+    def add_item_objects(self):
+        """
+        Add movable items (pushed and carried by the robots) to the environment.
+        Example:
+            self.items.add(x, y, radius, color)
+        """
+        pass
+
     @abstractmethod
     def set_background_color(self):
         self.displaySurface.fill(self.BACKGROUND_COLOR)
@@ -102,9 +187,297 @@ class Environment():
     def get_dynamic_circ_list(self):
         return self.dynamicCircList
     def get_agent_object(self):
+        """
+        Returns: bounding rects of all agents at the beginning of the timestep (built on first use)
+        """
+        if self.agent_object_list is None:
+            import pygame
+            self.agent_object_list = [pygame.Rect(x - 15, y - 15, 30, 30) for x, y in self.agentGrid.points.tolist()]
         return self.agent_object_list
     def get_dynamic_line_list(self):
         return self.dynamicLineList
+    def get_agent_positions(self):
+        return self.agent_positions[:self.agent_count]
+    def get_agent_headings(self):
+        return self.agent_headings[:self.agent_count]
+
+    def add_agent_slot(self, actuation):
+        """
+        Reserve one row of the swarm arrays for an agent.
+        Position and heading of the actuation object become views on this row.
+
+        Args:
+            actuation (actuation.py): actuation object of the new agent
+        Returns: index of the row
+        """
+        slot = self.agent_count
+        if slot == len(self.agent_positions):
+            # grow geometrically and re-bind the views of all existing agents
+            grown = np.zeros((2 * slot, 2))
+            grown[:slot] = self.agent_positions
+            self.agent_positions = grown
+            grown = np.zeros(2 * slot)
+            grown[:slot] = self.agent_headings
+            self.agent_headings = grown
+            for i, owner in enumerate(self.slotOwners):
+                owner.bind_state(i)
+        self.agent_count += 1
+        self.slotOwners.append(actuation)
+        return slot
+
+    def remove_agent_slot(self, slot):
+        """
+        Free one row of the swarm arrays, the agent of the last row moves into it (O(1)).
+        Items carried by the removed agent are dropped.
+
+        Args:
+            slot (int): row of the removed agent
+        """
+        last = self.agent_count - 1
+        owner = self.slotOwners.pop()
+        if slot != last:
+            self.agent_positions[slot] = self.agent_positions[last]
+            self.agent_headings[slot] = self.agent_headings[last]
+            self.slotOwners[slot] = owner
+            owner.slot = slot
+            owner.bind_state(slot)
+        self.agent_count -= 1
+
+        carrier = self.items.carrier
+        if len(carrier):
+            carrier[carrier == slot] = -1
+            carrier[carrier == last] = slot
+
+    def load_world_map(self, path, cell_size=10, color='BLACK'):
+        """
+        Load the walls of a text map or bitmap and add their merged rectangles to the static objects.
+
+        Args:
+            path (str): map file (compiled geometry is cached next to it)
+            cell_size (int): edge length of one map cell in world pixels
+            color (str or tuple): color of the walls
+        """
+        import pygame
+        self.worldMap = load_world_map(path, cell_size)
+        start = len(self.staticRectList)
+        for x, y, w, h in self.worldMap.rects.tolist():
+            self.staticRectList.append([color, pygame.Rect(x, y, w, h), 0])
+        self.mapRects = range(start, len(self.staticRectList))
+
+    def build_static_index(self):
+        """
+        Register all static rectangles and circles in the static bucket grids.
+        Has to be called again if static objects are added after render_init().
+        """
+        cell_size = self.config.get('static_cell_size', 256)
+        self.staticRectGrid = StaticGrid(cell_size)
+        for i, x in enumerate(self.staticRectList):
+            self.staticRectGrid.insert(i, x[1].left, x[1].top, x[1].right, x[1].bottom)
+        self.staticCircGrid = StaticGrid(cell_size)
+        for i, x in enumerate(self.staticCircList):
+            self.staticCircGrid.insert(i, x[1][0] - x[2], x[1][1] - x[2], x[1][0] + x[2], x[1][1] + x[2])
+
+    def update_spatial_index(self):
+        """
+        Re-index all agents, called once per timestep before the agents are updated.
+        Positions (agentGrid.points) and headings (headingSnapshot) are copied, sensors read
+        other agents from this snapshot while the agents move.
+        """
+        self.agentGrid.build(self.get_agent_positions())
+        self.headingSnapshot = self.get_agent_headings().copy()
+        self.neighborCache = {}
+        self.agent_object_list = None
+
+    def visible_agents(self, margin=30):
+        """
+        Query the agent grid for agents inside the camera view.
+
+        Args:
+            margin (int): extension of the view in world pixels (agent body radius)
+        Returns: array of agent slot indices
+        """
+        x0, y0, x1, y1 = self.camera.view_rect()
+        return self.agentGrid.query_rect(x0 - margin, y0 - margin, x1 + margin, y1 + margin)
+
+    def wrap_positions(self):
+        """
+        Wrap all agent positions into the world (torus topology only).
+        """
+        if self.torus:
+            positions = self.get_agent_positions()
+            np.mod(positions, self.worldSize, out=positions)
+
+    def displacement(self, origin, targets):
+        """
+        Vector from origin to each target, using minimum-image distances on a torus.
+
+        Args:
+            origin (array_like): x-y position or (N, 2) array of positions
+            targets (np.ndarray): (N, 2) array of positions
+        Returns: (N, 2) array of displacement vectors
+        """
+        d = np.asarray(targets, dtype=float) - origin
+        if self.torus:
+            d -= self.worldSize * np.round(d / self.worldSize)
+        return d
+
+    def neighbors_in_range(self, x, y, radius):
+        """
+        Query the agent grid for agents within radius of a point.
+        The positions are taken from the snapshot of the last update_spatial_index().
+
+        The order of the agents does not depend on the current grid configuration.
+
+        Returns: (indices, displacements) with the slot indices (ascending) and the (K, 2) vectors from (x, y) to the agents
+        """
+        grid = self.agentGrid
+        idx = np.sort(grid.query_radius(x, y, radius))
+        d = self.displacement((x, y), grid.points[idx])
+        keep = np.einsum('ij,ij->i', d, d) <= radius * radius
+        return idx[keep], d[keep]
+
+    def bodies_at(self, points, exclude=-1):
+        """
+        Exact collision query against the body outlines of the agents, e.g. for contact sensors.
+        The positions and headings are taken from the snapshot of the last update_spatial_index().
+
+        Args:
+            points (array_like): (K, 2) query points
+            exclude (int): slot of an agent to ignore (the querying agent)
+        Returns: (point indices, agent slots) of all points lying inside an agent body
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        grid = self.agentGrid
+        x0, y0 = points.min(axis=0) - BODY_REACH
+        x1, y1 = points.max(axis=0) + BODY_REACH
+        candidates = grid.query_rect(x0, y0, x1, y1)
+        candidates = candidates[candidates != exclude]
+        if len(candidates) == 0:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty
+
+        # points relative to the candidates, only pairs within reach of a body are tested against its outline
+        d = points[:, None, :] - grid.points[candidates][None, :, :]
+        if self.torus:
+            d -= self.worldSize * np.round(d / self.worldSize)
+        pair_point, pair_agent = np.nonzero(np.einsum('kcj,kcj->kc', d, d) <= BODY_REACH * BODY_REACH)
+        polygons = swarm_polygons(np.zeros((len(pair_agent), 2)), self.headingSnapshot[candidates[pair_agent]])
+        inside = points_in_polygons(polygons, d[pair_point, pair_agent])
+        return pair_point[inside], candidates[pair_agent[inside]]
+
+    def nearest_neighbors(self, k, max_radius=np.inf):
+        """
+        k nearest agents of every agent, answered for all agents in one batch.
+        The positions are taken from the snapshot of the last update_spatial_index(), the
+        result is cached until then, so every controller can call it and read its row (slot).
+
+        Args:
+            k (int): number of neighbours
+            max_radius (float): ignore agents farther away
+        Returns: (indices, distances), (N, k) arrays, row = agent slot, nearest first, padded with -1 and inf
+        """
+        key = ('knn', k, max_radius)
+        if key not in self.neighborCache:
+            self.neighborCache[key] = nearest_neighbors(self.agentGrid.points, k, self.worldSize, self.torus,
+                                                        max_radius=max_radius)
+        return self.neighborCache[key]
+
+    def neighbors_within(self, radius, max_neighbors):
+        """
+        Closest agents within radius of every agent, answered for all agents in one batch (see nearest_neighbors).
+
+        Args:
+            radius (float): search radius
+            max_neighbors (int): at most this many neighbours per agent, the closest are kept
+        Returns: (indices, distances), (N, max_neighbors) arrays, row = agent slot, nearest first, padded with -1 and inf
+        """
+        key = ('radius', radius, max_neighbors)
+        if key not in self.neighborCache:
+            self.neighborCache[key] = radius_neighbors(self.agentGrid.points, radius, max_neighbors, self.worldSize,
+                                                       self.torus)
+        return self.neighborCache[key]
+
+    def neighbor_states(self, indices, agents=None):
+        """
+        Relative positions and headings of neighbours from the snapshot of the last update_spatial_index().
+
+        Args:
+            indices (np.ndarray): padded neighbour indices, (N, K) from nearest_neighbors / neighbors_within or one (K,) row
+            agents (np.ndarray): slots of the rows of indices (one slot for one row), None = row i belongs to slot i
+        Returns: (displacements, headings), vectors from the agents to their neighbours (..., K, 2)
+                 and neighbour headings in degrees (..., K), 0 and NaN where padded
+        """
+        indices = np.asarray(indices)
+        if agents is None:
+            agents = np.arange(len(indices))
+        padded = indices < 0
+        safe = np.where(padded, 0, indices)
+        points = self.agentGrid.points
+        d = points[safe] - points[agents][..., None, :]
+        if self.torus:
+            d -= self.worldSize * np.round(d / self.worldSize)
+        d[padded] = 0
+        headings = self.headingSnapshot[safe].astype(float)
+        headings[padded] = np.nan
+        return d, headings
+
+    def add_agent_polygons(self, indices):
+        """
+        Queue the body polygons of the given agents for drawing, computed in one batch.
+
+        Args:
+            indices (np.ndarray): agent slot indices, e.g. from visible_agents()
+        Requires the body lookup table (Body.helperLUT).
+        """
+        polygons = swarm_polygons(self.agent_positions[indices], self.agent_headings[indices])
+        for i, poly in zip(indices, polygons):
+            body = self.agentlist[i].body
+            body.polyCur = poly
+            self.dynamicPolyList.append([body.COLOR, poly, 3])
+
+    def update_items(self):
+        """
+        Resolve robot-item contacts and move carried items, called once per timestep after the agents moved.
+        """
+        self.items.update(self.agentGrid, self.get_agent_positions())
+
+    def items_in_range(self, x, y, radius):
+        """
+        Query the item index for items within radius of a point.
+
+        Returns: (indices, displacements) with the item indices and the (K, 2) vectors from (x, y) to the items
+        """
+        idx = np.asarray(self.items.query_rect(x - radius, y - radius, x + radius, y + radius), dtype=np.intp)
+        d = self.displacement((x, y), self.items.positions[idx])
+        keep = np.einsum('ij,ij->i', d, d) <= radius * radius
+        return idx[keep], d[keep]
+
+    def attach_state_arrays(self, positions, headings):
+        """
+        Replace the swarm arrays (e.g. by arrays in shared memory) and re-bind all agents.
+
+        Args:
+            positions (np.ndarray): (N, 2) array with the current agent positions
+            headings (np.ndarray): (N,) array with the current agent headings
+        """
+        self.agent_positions = positions
+        self.agent_headings = headings
+        for i, owner in enumerate(self.slotOwners):
+            owner.bind_state(i)
+
+    def update_pheromone(self):
+        """
+        Apply the deposits of this timestep, diffuse and evaporate the pheromone field.
+        """
+        if self.pheromone is not None:
+            self.pheromone.update()
+
+    def update_coverage(self):
+        """
+        Add the current agent positions to the coverage grid.
+        """
+        if self.coverage is not None:
+            self.coverage.update(self.get_agent_positions())
     """
     def defineLight(self):
         center = np.array([self.width/2,self.height/2])
@@ -132,35 +505,80 @@ class Environment():
     def render(self):
         """
         This method is used to update the environment.
+        Only static objects inside the camera view are drawn, agents are culled by the caller (see visible_agents).
         """
+        import pygame
         self.set_background_color()
+        cam = self.camera
+        x0, y0, x1, y1 = cam.view_rect()
+
+        if self.pheromone is not None and self.config.get('pheromone_render', 1):
+            self.pheromone.draw(self.displaySurface, cam, saturation=self.config.get('pheromone_saturation', 10.0),
+                                interval=self.config.get('pheromone_render_interval', 5))
+
+        if cam.is_identity():
+            # world coordinates are screen coordinates
+            for i in self.staticRectGrid.query_rect(x0, y0, x1, y1):
+                x = self.staticRectList[i]
+                pygame.draw.rect(self.displaySurface, x[0], x[1], x[2])
+
+            for i in self.staticCircGrid.query_rect(x0, y0, x1, y1):
+                x = self.staticCircList[i]
+                pygame.draw.circle(self.displaySurface, x[0], x[1], x[2], x[3])
+
+            # draw movable items
+            items = self.items
+            for i in items.query_rect(x0, y0, x1, y1):
+                pygame.draw.circle(self.displaySurface, items.colors[i], items.positions[i], items.radii[i])
+
+            # draw dynamic polygons (agents)
+            for x in self.dynamicPolyList:
+                pygame.draw.polygon(self.displaySurface, (255,255,255), x[1]) # fill the polygon
+                pygame.draw.polygon(self.displaySurface, x[0], x[1], 3)
+
+            # draw dynamic circles (agent tokens)
+            for x in self.dynamicCircList:
+                pygame.draw.circle(self.displaySurface, x[0], x[1], x[2], x[3])
+
+            for x in self.dynamicLineList:
+                pygame.draw.line(self.displaySurface, x[0], x[1], x[2])
 
-        # draw static rects (items = sources, sinks, obstacles)
-        for x in self.staticRectList:
-            pygame.draw.rect(self.displaySurface, x[0], x[1], x[2])
+            for x in self.dynamicRectList:
+                pygame.draw.rect(self.displaySurface, x[0], x[1], x[2])
+        else:
+            # transform everything into the camera view
+            z = cam.zoom
+            for i in self.staticRectGrid.query_rect(x0, y0, x1, y1):
+                x = self.staticRectList[i]
+                pygame.draw.rect(self.displaySurface, x[0], cam.rect_to_screen(x[1]), x[2])
 
-        for x in self.staticCircList:
-            pygame.draw.circle(self.displaySurface, x[0], x[1], x[2], x[3])
+            for i in self.staticCircGrid.query_rect(x0, y0, x1, y1):
+                x = self.staticCircList[i]
+                pygame.draw.circle(self.displaySurface, x[0], cam.to_screen(x[1]), max(1, x[2] * z), x[3])
 
-                      
-        # draw dynamic polygons (agents)
-        for x in self.dynamicPolyList:
-            pygame.draw.polygon(self.displaySurface, (255,255,255), x[1]) # fill the polygon
-            pygame.draw.polygon(self.displaySurface, x[0], x[1], 3)
+            items = self.items
+            for i in items.query_rect(x0, y0, x1, y1):
+                pygame.draw.circle(self.displaySurface, items.colors[i], cam.to_screen(items.positions[i]), max(1, items.radii[i] * z))
 
+            for x in self.dynamicPolyList:
+                poly = cam.to_screen(x[1])
+                pygame.draw.polygon(self.displaySurface, (255,255,255), poly)
+                pygame.draw.polygon(self.displaySurface, x[0], poly, 3)
 
-        # draw dynamic circles (agent tokens)
-        for x in self.dynamicCircList:
-            agent = pygame.draw.circle(self.displaySurface, x[0], x[1], x[2], x[3])
-            #print("test", agent)
-            #self.agent_object_list.append(agent)
+            for x in self.dynamicCircList:
+                if x0 - x[2] <= x[1][0] <= x1 + x[2] and y0 - x[2] <= x[1][1] <= y1 + x[2]:
+                    pygame.draw.circle(self.displaySurface, x[0], cam.to_screen(x[1]), max(1, x[2] * z), x[3])
 
-        for x in self.dynamicLineList:
-            pygame.draw.line(self.displaySurface, x[0], x[1], x[2])
+            for x in self.dynamicLineList:
+                if x0 <= x[1][0] <= x1 and y0 <= x[1][1] <= y1:
+                    pygame.draw.line(self.displaySurface, x[0], cam.to_screen(x[1]), cam.to_screen(x[2]))
 
-        for x in self.dynamicRectList:
-            pygame.draw.rect(self.displaySurface, x[0], x[1], x[2])
+            for x in self.dynamicRectList:
+                if x[1].right >= x0 and x[1].left <= x1 and x[1].bottom >= y0 and x[1].top <= y1:
+                    pygame.draw.rect(self.displaySurface, x[0], cam.rect_to_screen(x[1]), x[2])
 
+        # debug overlay (sensor geometry), rasterized in one batch
+        self.overlay.draw(self.displaySurface, cam)
 
         # reset dynamic buffers
         self.resetDynamicBuffers()                  
@@ -174,6 +592,7 @@ class Environment():
         self.dynamicPolyList = []
         self.dynamicLineList = []
         self.dynamicRectList = []
+        self.overlay.clear()
         
             
 
@@ -8,7 +8,8 @@
 """
 Description:
 In this module one specific experiment can be executed.
-The module initilizes pygame.
+The module initilizes pygame, unless the run is headless (rendering = -1): headless
+runs neither import nor initialize pygame, so short worker runs start quickly.
 The parameters for the simulation are:
     - simulation speed
     - maximum agent speed
@@ -18,10 +19,10 @@ The parameters for the simulation are:
 # =============================================================================
 # Imports
 # =============================================================================
-import pygame
+import os
 import random
-import sys
-sys.path.insert(0, '..')  # add parent directory to path
+import time
+import numpy as np
 # import internal object classes
 #from .environment import Environment
 #from world.my_world import my_environment
@@ -33,29 +34,79 @@ sys.path.insert(0, '..')  # add parent directory to path
 # =============================================================================
 class Experiment():
     
-    def __init__(self, config, agent_controller, agent_sensing, world, agent):
+    def __init__(self, config, agent_controller, agent_sensing, world, agent, stop_conditions=None, frame_callback=None):
         super(Experiment, self).__init__()
 
         self.config = config
         self.agent_controller = agent_controller
         self.agent_sensing = agent_sensing
+        self.stop_conditions = stop_conditions or []        # see stopping.py
+        self.frame_callback = frame_callback                # frame_callback(timestep, frame) for rendering = 2, see raster.py
+        self.result = None
+
+        # seed before the world is built, worlds may place objects randomly
+        self.seed = config.get('seed')
+        if self.seed is not None:
+            random.seed(self.seed)
+            np.random.seed(self.seed)
+
         self.world = world(config)
         self.agent = agent
-        
-
 
+    def create_agents(self, environment):
+        """
+        Instantiate all agents, assign the controllers according to the controller ratios.
 
+        Returns: list of agents, index = unique_id
+        """
+        agentList = []
+        agent_counter = 0
+        controller_counter = 0
+        while agent_counter <self.config['number_of_agents']:
+            if agent_counter/self.config['number_of_agents'] >= self.config['controller_1']:
+                controller_counter = 1
+            newAgent = self.agent(environment,self.agent_controller[controller_counter],self.agent_sensing, self.config)
+            newAgent.initial_position()
+            newAgent.unique_id = agent_counter
+            agentList.append(newAgent)
+            agent_counter +=1
+        environment.agentlist = agentList
+        return agentList
         
     def run(self, rendering):
         """
         Start swarm simulation expermiment
         
         Args:
-            rendering               (int):   1 = show simulation; -1 = hide simulation; 0 = black screen (capture mode)           
+            rendering               (int):   1 = show simulation; -1 = hide simulation; 0 = black screen (capture mode);
+                                             2 = frames into a NumPy array, no display (see raster.py)           
+        Returns: ExperimentResult
         """
-        # pygame presets
-        pygame.init() 					        # initialize pygame
+        # answer repeated headless runs of a seeded experiment from the result cache; runs whose
+        # outputs cannot be restored (user files of save_information, live telemetry) are not cached
+        cache = None
+        if (self.config.get('result_cache') and rendering not in (1, 2) and self.seed is not None
+                and not self.config['save_trajectory'] and not self.config.get('telemetry_port')):
+            from .cache import ResultCache
+            cache = ResultCache(self.config['result_cache'])
+            cacheKey = cache.key(self)
+            cached = cache.load(cacheKey)
+            if cached is not None:
+                print('Experiment result loaded from cache ({}).'.format(cacheKey[:12]))
+                self.result = cached
+                return cached
+
+        # pygame presets (pygame is loaded on first use, headless runs do without it)
+        headless = rendering == -1
+        if not headless:
+            if rendering == 2:
+                os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')   # events and keys without a display
+            import pygame
+            pygame.init() 					        # initialize pygame
         running = True   				        # termination condition
+        stop_reason = 'max_timestep'
+        reproducible = True                     # False if a stop condition ended the run independently of the simulation
+        start_time = time.perf_counter()
             
         # tracking variable
         timesteps_counter = 0
@@ -65,78 +116,245 @@ class Experiment():
 
         # instantiate environment
         environment = self.world
-        environment.render_init()
+        environment.render_init(rendering)
+        environment.overlay.enabled = rendering == 1 and bool(self.config.get('debug_overlay', 1))     # only collected when shown
 
         # instatiate agent
-        agentList = []
-        agent_counter = 0
-        controller_counter = 0
-        while agent_counter <self.config['number_of_agents']:
-            if agent_counter/self.config['number_of_agents'] >= self.config['controller_1']:
-                controller_counter = 1
-            newAgent = self.agent(environment,self.agent_controller[controller_counter],self.agent_sensing, self.config)
-            newAgent.initial_position()
-            newAgent.unique_id = agent_counter
-            agentList.append(newAgent)
-            agent_counter +=1
-        environment.agentlist = agentList
+        agentList = self.create_agents(environment)
         # -----------------------------------------------------------------------------
         # initializations
         if agentList:
             agentList[0].body.helperLUT()    # global lookup table needs to be calculated only once
 
+        # spatial domain decomposition: agents are updated by one worker process per tile
+        decomposition = None
+        if self.config.get('processes', 1) > 1:
+            if environment.pheromone is not None:
+                raise RuntimeError('The pheromone field is not shared between processes, set processes: 1')
+            from .decomposition import TileDecomposition
+            decomposition = TileDecomposition(self, environment, self.config['processes'])
+
+        # runtime spawning and removal of agents (not available with processes > 1)
+        population = None
+        if decomposition is None:
+            from .population import Population
+            population = Population(self, environment)
+            environment.population = population
+
+        # thread-parallel agent update (two-phase: sensors read the snapshot, agents commit their own rows)
+        threadPool = None
+        if decomposition is None and self.config.get('threads', 1) > 1:
+            from .parallel import AgentThreadPool
+            threadPool = AgentThreadPool(self.config['threads'])
+
+        for condition in self.stop_conditions:
+            condition.reset()
+
+        # trajectory file for the replay viewer (replay.py)
+        recorder = None
+        if self.config.get('record_trajectory'):
+            from .recording import TrajectoryRecorder
+            recorder = TrajectoryRecorder(self.config['record_trajectory'], environment)
+
+        # swarm metrics stream (dispersion, neighbours, clusters, ...) every interval timesteps
+        metrics = None
+        if self.config.get('metrics_interval', 0) > 0:
+            from .metrics import SwarmMetrics
+            metrics = SwarmMetrics(environment, self.config['metrics_interval'], self.config.get('metrics_link_distance', 40),
+                                   self.config.get('metrics_hit_sensor', 'BumperSensor'))
+
+        # live snapshots (poses, metrics, phase timings) for local subscribers, see telemetry.py
+        telemetry = None
+        if self.config.get('telemetry_port'):
+            from .telemetry import TelemetryServer
+            telemetry = TelemetryServer(self.config['telemetry_port'], self.config.get('telemetry_rate', 10))
+        tick = time.perf_counter
+
         # =============================================================================
         # Run experiment: Loop-Processing
         # =============================================================================
         while running and timesteps_counter < self.config["max_timestep"]:
             timesteps_counter += 1
+            environment.timestep = timesteps_counter
+            t0 = tick()
 
             
             #-----------------------------------------------------------------------------
             # ASYNCHRON 
             
             # get the set of keys pressed and check for user input
-            pressedKeys = pygame.key.get_pressed()
+            if headless:
+                pressedKeys = NO_KEYS
+            else:
+                pressedKeys = pygame.key.get_pressed()
                        
             # handle user input
-            for event in pygame.event.get():
+            for event in (() if headless else pygame.event.get()):
+                environment.camera.handle_event(event)
+                environment.overlay.handle_event(event)
                 
                 if event.type == pygame.KEYDOWN:    # Check for KEYDOWN event
                                     
                     # If the Esc key is pressed, then exit the main loop
                     if event.key == pygame.K_ESCAPE:
                         running = False
+                        stop_reason = 'manual'
                         
                 # Check for QUIT event. If QUIT, then set running to false.
                 elif event.type == pygame.QUIT:
                     running = False
+                    stop_reason = 'manual'
+            if not headless:
+                environment.camera.processUserInput(pressedKeys)
      
             #-----------------------------------------------------------------------------
             # SYNCHRON         
-            for agent in agentList:
-                environment.agent_object_list.append(
-                    pygame.Rect(agent.actuation.position[0] - 15, agent.actuation.position[1] - 15, 30, 30))
+            t1 = tick()
+            if population is not None:
+                population.commit()         # spawns and removals requested in the last timestep
+            environment.update_spatial_index()
             # update agents
-            for newAgent in agentList:
-                newAgent.processing.perform(pressedKeys)
-                #pygame.Rect(5, self.config['world_height'] - 10, self.config['world_width'] - 10, 5)
+            if decomposition is not None:
+                decomposition.step(timesteps_counter, pressedKeys)
+            elif threadPool is not None:
+                threadPool.step(agentList, pressedKeys, timesteps_counter, self.seed)
+            else:
+                step_agents(agentList, pressedKeys, timesteps_counter, self.seed)
+            if environment.integrator is not None and decomposition is None:
+                environment.integrator.step(agentList)     # velocity commands of this timestep
+            t2 = tick()
+            environment.wrap_positions()
+            environment.update_items()
+            environment.update_pheromone()
+            environment.update_coverage()
+            t3 = tick()
+            if recorder is not None:
+                recorder.record()
+            if metrics is not None:
+                # sensor values of decomposed agents live in the worker processes
+                metrics.record(timesteps_counter, agentList if decomposition is None else None)
+
+            # early termination, checked on the swarm arrays every interval timesteps
+            for condition in self.stop_conditions:
+                if timesteps_counter % condition.interval == 0 and condition.check(environment, timesteps_counter):
+                    running = False
+                    stop_reason = condition.describe()
+                    reproducible = condition.reproducible
+                    break
+            t4 = tick()
 
 
             # display results
             if(rendering == 1):
-                for newAgent in agentList:
-                    newAgent.body.render()         # update agent bod
+                environment.add_agent_polygons(environment.visible_agents())    # update agent bodies inside the camera view
                 environment.render()           # update content on display
+            elif rendering == 2:
+                frame = environment.pixelRenderer.render()
+                if self.frame_callback is not None:
+                    self.frame_callback(timesteps_counter, frame)
 
-            environment.agent_object_list = []
+            if telemetry is not None:
+                telemetry.publish(timesteps_counter, environment, metrics,
+                                  (('input', t1 - t0), ('agents', t2 - t1), ('world', t3 - t2),
+                                   ('record', t4 - t3), ('render', tick() - t4)))
+
+        if decomposition is not None:
+            decomposition.finish(agentList)
+        if threadPool is not None:
+            threadPool.shutdown()
+        if recorder is not None:
+            recorder.close()
+        if telemetry is not None:
+            telemetry.close()
         if self.config['save_trajectory']:
             for i,agent in enumerate(agentList):
                 if i == len(agentList)-1:
                     agent.save_information(True)
                 else:
                     agent.save_information(False)
+        outputFiles = [self.config['record_trajectory']] if recorder is not None else []
+        if self.config.get('save_coverage', 0) and environment.coverage is not None:
+            environment.coverage.save('coverage.npz')
+            outputFiles.append('coverage.npz')
+        if metrics is not None and self.config.get('save_metrics'):
+            metrics.save(self.config['save_metrics'])
+            path = self.config['save_metrics']
+            outputFiles.append(path if path.endswith('.npz') else path + '.npz')    # extension added by NumPy
+
+
+        self.result = ExperimentResult(environment, timesteps_counter, stop_reason, time.perf_counter() - start_time, metrics)
+        if cache is not None and reproducible and stop_reason != 'manual':
+            cache.store(cacheKey, self.result, outputFiles)
+        if stop_reason in ('manual', 'max_timestep'):
+            print('Experiment finished by manual stopping or maximum timesteps reached. Check config.yaml to increase the maximum timesteps.')
+        else:
+            print('Experiment finished after {} timesteps: {}.'.format(timesteps_counter, stop_reason))
+        if not headless:
+            pygame.quit()
+        return self.result
+
+
+class ExperimentResult():
+    """
+    Summary of a finished experiment.
+
+    Attributes:
+        timesteps   (int):          number of simulated timesteps
+        stop_reason (str):          'max_timestep', 'manual' or the description of a stop condition
+        wall_time   (float):        duration of the run in seconds
+        positions   (np.ndarray):   (N, 2) final agent positions
+        headings    (np.ndarray):   (N,) final agent headings
+        coverage    (float):        final coverage fraction (None if coverage tracking is off)
+        coverage_over_time (np.ndarray): coverage fraction after every timestep (None if off)
+        heatmap     (np.ndarray):   final visit counts (None if off)
+        metrics     (dict):         swarm metrics time series, name -> np.ndarray (None if off)
+    """
+    def __init__(self, environment, timesteps, stop_reason, wall_time, metrics=None):
+        self.timesteps = timesteps
+        self.stop_reason = stop_reason
+        self.wall_time = wall_time
+        self.positions = environment.get_agent_positions().copy()
+        self.headings = environment.get_agent_headings().copy()
+        coverage = environment.coverage
+        self.coverage = coverage.fraction() if coverage is not None else None
+        self.coverage_over_time = coverage.fraction_over_time() if coverage is not None else None
+        self.heatmap = coverage.heatmap().copy() if coverage is not None else None
+        self.metrics = metrics.series() if metrics is not None else None
+
+
+# =============================================================================
+# Helper functions
+# =============================================================================
+class _NoKeys():
+    """
+    Stand-in for pygame.key.get_pressed() in headless runs: no key is pressed.
+    """
+    def __getitem__(self, key):
+        return False
+
+    def __bool__(self):
+        return False
+
+NO_KEYS = _NoKeys()
+
 
+def step_agents(agents, pressedKeys, timestep, seed=None):
+    """
+    Update the given agents for one timestep.
+    With a seed the random generator of every agent (agent.random) is re-seeded for every
+    timestep, so the result does not depend on the update order (serial, split across
+    threads or processes). The global random module is not touched.
 
-        print('Experiment finished by manual stopping or maximum timesteps reached. Check config.yaml to increase the maximum timesteps.')
-        pygame.quit()
-        return None
+    Args:
+        agents ([agent.py]): agents to update
+        pressedKeys (Pygame Keyboard Codes): keys pressed in this timestep
+        timestep (int): current timestep
+        seed (int): experiment seed or None
+    """
+    if seed is None:
+        for newAgent in agents:
+            newAgent.processing.perform(pressedKeys)
+        return
+    for newAgent in agents:
+        newAgent.random.seed((seed * 1000003 + timestep) * 1000003 + newAgent.unique_id)
+        newAgent.processing.perform(pressedKeys)
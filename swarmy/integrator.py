@@ -0,0 +1,108 @@
+"""
+Description:
+This module integrates the motion of the agents with a fixed time step (dt > 0 in config.yaml).
+Controllers are unchanged: in this mode stepForward/stepBackward/turn_left/turn_right
+set velocity commands in world units and degrees per second instead of moving the
+agent. After all controllers of a timestep ran, the commands of all agents are
+integrated over dt on the swarm arrays.
+
+An agent that would move farther than max_step_distance in one timestep is moved
+in sub-steps, and every sub-step is checked against the static rectangles and circles
+(and the occupancy grid of a map file, see worldmap.py).
+A fast agent stops at an obstacle instead of tunneling through it, while slow
+agents take the whole step at once.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import numpy as np
+
+# =============================================================================
+# Class
+# =============================================================================
+class Integrator():
+    """
+    Fixed time step integration of the velocity commands.
+
+    Args:
+        environment (environment.py): environment with the swarm arrays and the static objects
+        dt (float): duration of one timestep in seconds
+        max_step_distance (float): largest distance an agent moves without sub-stepping
+    """
+    AGENT_RADIUS = 15               # collision radius of an agent body
+
+    def __init__(self, environment, dt, max_step_distance):
+        """
+        Initialize integrator object.
+        """
+        self.environment = environment
+        self.dt = dt
+        self.max_step_distance = max_step_distance
+
+        # static obstacles grown by the agent radius (every rectangle is treated as solid),
+        # walls of a map file are looked up in its grown occupancy grid instead
+        r = self.AGENT_RADIUS
+        self.mapGrid = environment.worldMap.inflate(r) if environment.worldMap is not None else None
+        rects = [x[1] for i, x in enumerate(environment.staticRectList) if i not in environment.mapRects]
+        self.rects = np.array([(q.left - r, q.top - r, q.right + r, q.bottom + r) for q in rects], dtype=float).reshape(-1, 4)
+        self.circles = np.array([(x[1][0], x[1][1], x[2] + r) for x in environment.staticCircList], dtype=float).reshape(-1, 3)
+
+    def collides(self, positions):
+        """
+        Returns: bool array, True for positions where an agent overlaps a static object
+        """
+        x, y = positions[:, 0, None], positions[:, 1, None]
+        rects = self.rects
+        hit = ((x > rects[:, 0]) & (x < rects[:, 2]) & (y > rects[:, 1]) & (y < rects[:, 3])).any(axis=1)
+        if len(self.circles):
+            d2 = (x - self.circles[:, 0]) ** 2 + (y - self.circles[:, 1]) ** 2
+            hit |= (d2 < self.circles[:, 2] ** 2).any(axis=1)
+        if self.mapGrid is not None:
+            hit |= self.mapGrid.occupied_many(positions)
+        return hit
+
+    def step(self, agents):
+        """
+        Integrate and reset the velocity commands of the given agents for one timestep.
+
+        Args:
+            agents ([agent.py]): agents updated in this timestep
+        """
+        n = len(agents)
+        if n == 0:
+            return
+        actuations = [agent.actuation for agent in agents]
+        slots = np.fromiter((a.slot for a in actuations), dtype=np.intp, count=n)
+        speed = np.fromiter((a.linearCommand for a in actuations), dtype=float, count=n)
+        turn = np.fromiter((a.turnCommand for a in actuations), dtype=float, count=n)
+        for a in actuations:
+            a.linearCommand = 0.0
+            a.turnCommand = 0.0
+
+        environment = self.environment
+        positions = environment.agent_positions[slots]
+        headings = environment.agent_headings[slots]
+
+        # sub-steps per agent, only fast agents are split
+        substeps = np.maximum(np.ceil(np.abs(speed) * self.dt / self.max_step_distance), 1).astype(np.intp)
+        h = self.dt / substeps
+        blocked = np.zeros(n, dtype=bool)
+        for j in range(int(substeps.max())):
+            active = j < substeps
+            headings = np.where(active, headings + turn * h, headings)
+            moving = active & ~blocked & (speed != 0)
+            if not moving.any():
+                continue
+            angle = np.radians(headings[moving])
+            distance = speed[moving] * h[moving]
+            target = positions[moving] + distance[:, None] * np.stack((np.sin(angle), np.cos(angle)), axis=1)
+            # entering an obstacle stops the agent, agents that already overlap may leave
+            enter = self.collides(target) & ~self.collides(positions[moving])
+            idx = np.flatnonzero(moving)
+            positions[idx[~enter]] = target[~enter]
+            blocked[idx[enter]] = True
+
+        environment.agent_positions[slots] = positions
+        environment.agent_headings[slots] = headings % 360
+
@@ -0,0 +1,228 @@
+"""
+Description:
+This module represents movable items (e.g. food, pucks, boxes) in the environment.
+Items are circles stored in flat arrays. Robots push items out of their way and
+can carry them. Contacts of all agents with all items are resolved in one batch
+per timestep and the item index is only updated for items that moved.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import math
+import numpy as np
+from .spatial import axis_cells
+
+# =============================================================================
+# Class
+# =============================================================================
+class Items():
+    """
+    Array-backed set of circular items.
+
+    Args:
+        width (int): world width in pixels
+        height (int): world height in pixels
+        cell_size (int): edge length of the index cells in pixels
+        periodic (bool): world wraps around its borders (torus topology)
+    """
+    def __init__(self, width, height, cell_size, periodic=False):
+        """
+        Initialize items object.
+        """
+        # constants
+        self.AGENT_RADIUS = 15          # contact radius of a robot
+        self.cell_size = cell_size
+        self.cols, self.cellWidth = axis_cells(width, cell_size, periodic)
+        self.rows, self.cellHeight = axis_cells(height, cell_size, periodic)
+        self.worldSize = np.array([width, height], dtype=float)
+        self.periodic = periodic
+
+        # item state, one row per item
+        self.positions = np.zeros((0, 2))
+        self.radii = np.zeros(0)
+        self.colors = np.zeros((0, 3), dtype=np.uint8)
+        self.carrier = np.zeros(0, dtype=np.intp)       # slot of the carrying agent, -1 = lying on the ground
+
+        # incremental index: cell key per item and item set per cell
+        self.cellKeys = np.zeros(0, dtype=np.intp)
+        self.cells = {}
+
+    def __len__(self):
+        return len(self.radii)
+
+    def add(self, x, y, radius, color=(200, 150, 0)):
+        """
+        Add one item.
+
+        Returns: index of the new item
+        """
+        return int(self.add_many([(x, y)], radius, color)[0])
+
+    def add_many(self, positions, radii, color=(200, 150, 0)):
+        """
+        Add a batch of items at once (preferred for large numbers of items).
+
+        Args:
+            positions (array_like): (K, 2) item centers
+            radii (float or array_like): item radius or (K,) radii
+            color ((int, int, int)): color of all new items
+        Returns: indices of the new items
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        first = len(self.radii)
+        new = np.arange(first, first + len(positions))
+        self.positions = np.concatenate([self.positions, positions])
+        self.radii = np.concatenate([self.radii, np.broadcast_to(np.asarray(radii, dtype=float), len(positions))])
+        self.colors = np.concatenate([self.colors, np.tile(np.asarray(color, dtype=np.uint8), (len(positions), 1))])
+        self.carrier = np.concatenate([self.carrier, np.full(len(positions), -1, dtype=np.intp)])
+        keys = self.keys_of(positions)
+        self.cellKeys = np.concatenate([self.cellKeys, keys])
+        for i, key in zip(new.tolist(), keys.tolist()):
+            self.cells.setdefault(key, set()).add(i)
+        return new
+
+    def keys_of(self, positions):
+        """
+        Returns: row-major cell keys of the positions
+        """
+        cx = (positions[:, 0] // self.cellWidth).astype(np.intp)
+        cy = (positions[:, 1] // self.cellHeight).astype(np.intp)
+        if self.periodic:
+            return (cy % self.rows) * self.cols + cx % self.cols
+        return np.clip(cy, 0, self.rows - 1) * self.cols + np.clip(cx, 0, self.cols - 1)
+
+    def reindex(self, moved):
+        """
+        Update the index for the given items, only items that changed their cell are touched.
+
+        Args:
+            moved (np.ndarray): indices of the items that moved
+        """
+        if len(moved) == 0:
+            return
+        keys = self.keys_of(self.positions[moved])
+        changed = keys != self.cellKeys[moved]
+        for i, old, new in zip(moved[changed].tolist(), self.cellKeys[moved][changed].tolist(), keys[changed].tolist()):
+            self.cells[old].discard(i)
+            self.cells.setdefault(new, set()).add(i)
+        self.cellKeys[moved] = keys
+
+    def query_rect(self, x0, y0, x1, y1):
+        """
+        Returns: sorted list of items in the cells overlapping the rectangle
+        """
+        w, h = self.cellWidth, self.cellHeight
+        found = []
+        for cy in self._cell_range(int(y0 // h), int(y1 // h), self.rows):
+            for cx in self._cell_range(int(x0 // w), int(x1 // w), self.cols):
+                bucket = self.cells.get(cy * self.cols + cx)
+                if bucket:
+                    found.extend(bucket)
+        return sorted(found)
+
+    def _cell_range(self, c0, c1, n):
+        """
+        Cell indices c0..c1, wrapped (periodic) or clipped to 0..n-1.
+        """
+        if not self.periodic:
+            return range(max(c0, 0), min(c1, n - 1) + 1)
+        if c1 - c0 + 1 >= n:
+            return range(n)
+        return [c % n for c in range(c0, c1 + 1)]
+
+#%% Carrying
+
+    def pick_up(self, item, slot):
+        """
+        Let the agent in the given slot carry an item.
+        """
+        self.carrier[item] = slot
+
+    def drop(self, item):
+        """
+        Put a carried item down at its current position.
+        """
+        self.carrier[item] = -1
+
+#%% Contact resolution
+
+    def contact_pairs(self, grid):
+        """
+        Find all agent-item pairs whose cells are neighbours, vectorized over all items.
+
+        Args:
+            grid (spatial.py): agent grid of the environment (sorted by cell key)
+        Returns: (agent slot indices, item indices) of the candidate pairs
+        """
+        items = np.flatnonzero(self.carrier < 0)
+        if len(items) == 0 or len(grid.order) == 0:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty
+
+        # the item cell size may differ from the agent grid, so the agent grid is queried directly
+        reach = self.AGENT_RADIUS + self.radii[items].max()
+        xOffsets = np.arange(-math.ceil(reach / grid.cellWidth), math.ceil(reach / grid.cellWidth) + 1)
+        yOffsets = np.arange(-math.ceil(reach / grid.cellHeight), math.ceil(reach / grid.cellHeight) + 1)
+        cx, cy = grid.cell_of(self.positions[items])
+        ncx, ncy = np.broadcast_arrays(cx[:, None, None] + xOffsets[None, :, None],
+                                       cy[:, None, None] + yOffsets[None, None, :])
+        if grid.periodic:
+            ncx, ncy = ncx % grid.cols, ncy % grid.rows
+            valid = np.ones(ncx.shape, dtype=bool)
+        else:
+            valid = (ncx >= 0) & (ncx < grid.cols) & (ncy >= 0) & (ncy < grid.rows)
+        keys = (ncy * grid.cols + ncx)[valid]
+        owner = np.broadcast_to(items[:, None, None], valid.shape)[valid]
+
+        # key range of each neighbour cell in the sorted agent grid, expanded into pairs
+        lo = np.searchsorted(grid.sortedKeys, keys, side='left')
+        hi = np.searchsorted(grid.sortedKeys, keys, side='right')
+        counts = hi - lo
+        total = counts.sum()
+        if total == 0:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty
+        item_idx = np.repeat(owner, counts)
+        start = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        agent_idx = grid.order[start + np.arange(total)]
+        return agent_idx, item_idx
+
+    def update(self, grid, agent_positions):
+        """
+        Resolve agent-item contacts and move carried items for one timestep.
+
+        Args:
+            grid (spatial.py): agent grid of the environment
+            agent_positions (np.ndarray): (N, 2) current agent positions
+        """
+        if len(self.radii) == 0:
+            return
+        moved = [np.flatnonzero(self.carrier >= 0)]
+        if len(moved[0]):
+            self.positions[moved[0]] = agent_positions[self.carrier[moved[0]]]
+
+        agent_idx, item_idx = self.contact_pairs(grid)
+        if len(agent_idx):
+            d = self.positions[item_idx] - agent_positions[agent_idx]
+            if self.periodic:
+                d -= self.worldSize * np.round(d / self.worldSize)
+            dist = np.sqrt(np.einsum('ij,ij->i', d, d))
+            overlap = self.AGENT_RADIUS + self.radii[item_idx] - dist
+            hit = overlap > 0
+            if hit.any():
+                # push each touched item out of every robot it overlaps, pushes are summed
+                d, dist, overlap, item_idx = d[hit], dist[hit], overlap[hit], item_idx[hit]
+                dist = np.where(dist > 1e-9, dist, 1.0)
+                push = d * (overlap / dist)[:, None]
+                np.add.at(self.positions, item_idx, push)
+                moved.append(np.unique(item_idx))
+
+        moved = np.concatenate(moved)
+        if len(moved):
+            if self.periodic:
+                self.positions[moved] %= self.worldSize
+            else:
+                r = self.radii[moved, None]
+                self.positions[moved] = np.clip(self.positions[moved], r, self.worldSize - r)
+            self.reindex(moved)
@@ -0,0 +1,216 @@
+"""
+Description:
+This module computes swarm-level statistics every `interval` timesteps directly from
+the swarm arrays of the environment and collects them as a compact time series:
+
+    centroid_x, centroid_y  center of the swarm (circular mean on a torus)
+    dispersion              root mean square distance to the centroid
+    nn_mean, nn_p10, nn_p50, nn_p90
+                            nearest neighbour distances of the agents that have a
+                            neighbour within link_distance
+    isolated                fraction of agents without a neighbour within link_distance
+    clusters                number of clusters (connected components of the occupied
+                            cells of a grid with cells of at least link_distance)
+    largest_cluster         fraction of the agents in the largest cluster
+    hit_rate                fraction of agents whose hit sensor (BumperSensor) fired
+    polarization            length of the mean heading vector (1 = all agents aligned)
+
+All statistics are vectorized, the neighbour search uses one grid sort and a
+searchsorted pair expansion over the 3x3 cell blocks, processed in chunks of bounded
+size so that the memory stays bounded for dense swarms.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import math
+import numpy as np
+from .spatial import cell_pairs
+
+FIELDS = ('centroid_x', 'centroid_y', 'dispersion', 'nn_mean', 'nn_p10', 'nn_p50', 'nn_p90', 'isolated',
+          'clusters', 'largest_cluster', 'hit_rate', 'polarization')
+
+# =============================================================================
+# Class
+# =============================================================================
+class SwarmMetrics():
+    """
+    Metrics stream of an experiment.
+
+    Args:
+        environment (environment.py): environment with the swarm arrays
+        interval (int): compute the metrics every interval timesteps
+        link_distance (float): neighbour distance for the nearest neighbours and the clusters
+        hit_sensor (str): class name of the sensor counted by hit_rate
+    """
+    def __init__(self, environment, interval, link_distance=40, hit_sensor='BumperSensor'):
+        """
+        Initialize metrics object.
+        """
+        self.environment = environment
+        self.interval = interval
+        self.link_distance = link_distance
+        self.hit_sensor = hit_sensor
+        self.periodic = environment.torus
+        self.worldSize = environment.worldSize
+
+        # cells are at least link_distance wide, so all neighbours lie in the 3x3 block
+        self.cols = max(1, int(environment.width // link_distance))
+        self.rows = max(1, int(environment.height // link_distance))
+        self.cellSize = self.worldSize / (self.cols, self.rows)
+
+        self.timesteps = []
+        self.columns = {name: [] for name in FIELDS}
+
+    def record(self, timestep, agents=None):
+        """
+        Compute and append the metrics if timestep is a multiple of the interval.
+
+        Args:
+            timestep (int): current timestep
+            agents ([agent.py]): agents with up to date sensor values, None = no hit rate
+        """
+        if timestep % self.interval != 0:
+            return
+        positions = self.environment.get_agent_positions()
+        if len(positions) == 0:
+            return
+        values = {}
+        values['centroid_x'], values['centroid_y'], values['dispersion'] = self.centroid(positions)
+        values.update(self.neighbors(positions))
+        values['hit_rate'] = self.hit_rate(agents)
+        angles = np.radians(self.environment.get_agent_headings())
+        values['polarization'] = math.hypot(np.sin(angles).mean(), np.cos(angles).mean())
+
+        self.timesteps.append(timestep)
+        for name in FIELDS:
+            self.columns[name].append(values[name])
+
+    def centroid(self, positions):
+        """
+        Returns: centroid x, centroid y and root mean square distance to the centroid
+        """
+        if self.periodic:
+            phase = positions * (2 * np.pi / self.worldSize)
+            mean = np.arctan2(np.sin(phase).mean(axis=0), np.cos(phase).mean(axis=0))
+            center = (mean * self.worldSize / (2 * np.pi)) % self.worldSize
+            d = positions - center
+            d -= self.worldSize * np.round(d / self.worldSize)
+        else:
+            center = positions.mean(axis=0)
+            d = positions - center
+        return float(center[0]), float(center[1]), float(np.sqrt(np.einsum('ij,ij->', d, d) / len(d)))
+
+    def neighbors(self, positions):
+        """
+        Returns: dict with the nearest neighbour and cluster statistics
+        """
+        n = len(positions)
+        cx = (positions[:, 0] // self.cellSize[0]).astype(np.intp)
+        cy = (positions[:, 1] // self.cellSize[1]).astype(np.intp)
+        if self.periodic:
+            cx, cy = cx % self.cols, cy % self.rows
+        else:
+            cx, cy = np.clip(cx, 0, self.cols - 1), np.clip(cy, 0, self.rows - 1)
+        keys = cy * self.cols + cx
+        order = np.argsort(keys, kind='stable')
+        sortedKeys = keys[order]
+
+        # nearest neighbour over all pairs of agents in neighbouring cells, in chunks of bounded size
+        nearest = np.full(n, np.inf)
+        for i, j in cell_pairs(cx, cy, self.cols, self.rows, self.periodic, sortedKeys, order):
+            keep = i != j
+            i, j = i[keep], j[keep]
+            d = positions[j] - positions[i]
+            if self.periodic:
+                d -= self.worldSize * np.round(d / self.worldSize)
+            if len(i):
+                # i is sorted (pairs are expanded agent by agent), reduce the runs of equal i
+                first = np.flatnonzero(np.r_[True, i[1:] != i[:-1]])
+                dist = np.minimum.reduceat(np.sqrt(np.einsum('ij,ij->i', d, d)), first)
+                nearest[i[first]] = np.minimum(nearest[i[first]], dist)
+        linked = nearest <= self.link_distance
+        found = nearest[linked]
+        if len(found):
+            p10, p50, p90 = np.percentile(found, (10, 50, 90))
+            stats = {'nn_mean': float(found.mean()), 'nn_p10': float(p10), 'nn_p50': float(p50), 'nn_p90': float(p90)}
+        else:
+            stats = dict.fromkeys(('nn_mean', 'nn_p10', 'nn_p50', 'nn_p90'), math.nan)
+        stats['isolated'] = 1 - len(found) / n
+
+        # clusters: connected components of the occupied cells (8-neighbourhood)
+        cells, agentCell = np.unique(keys, return_inverse=True)
+        root = _components(cells, self.cols, self.rows, self.periodic)
+        sizes = np.bincount(root[agentCell], minlength=len(cells))
+        stats['clusters'] = int(np.count_nonzero(sizes))
+        stats['largest_cluster'] = float(sizes.max() / n)
+        return stats
+
+    def hit_rate(self, agents):
+        """
+        Returns: fraction of agents whose hit sensor returned a true value, NaN if not available
+        """
+        if not agents:
+            return math.nan
+        names = [type(sensor).__name__ for sensor in agents[0].perception]
+        if self.hit_sensor not in names:
+            return math.nan
+        k = names.index(self.hit_sensor)
+        hits = np.fromiter((bool(agent.perception[k].value) for agent in agents), dtype=bool, count=len(agents))
+        return float(hits.mean())
+
+    def series(self):
+        """
+        Returns: dict with the timesteps and one float32 array per metric
+        """
+        data = {name: np.asarray(column, dtype=np.float32) for name, column in self.columns.items()}
+        data['timestep'] = np.asarray(self.timesteps, dtype=np.int32)
+        return data
+
+    def save(self, path):
+        """
+        Export the time series as a .npz file.
+        """
+        np.savez_compressed(path, **self.series())
+
+
+# =============================================================================
+# Helper functions
+# =============================================================================
+def _components(cells, cols, rows, periodic):
+    """
+    Connected components of occupied grid cells (8-neighbourhood), by hooking and pointer jumping.
+
+    Args:
+        cells (np.ndarray): sorted keys of the occupied cells
+    Returns: root index (into cells) of the component of every cell
+    """
+    cx, cy = cells % cols, cells // cols
+    edges_i, edges_j = [], []
+    for dx, dy in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        nx, ny = cx + dx, cy + dy
+        if periodic:
+            nx, ny = nx % cols, ny % rows
+            inside = np.ones(len(cells), dtype=bool)
+        else:
+            inside = (nx < cols) & (ny >= 0) & (ny < rows)
+        nkeys = ny * cols + nx
+        pos = np.minimum(np.searchsorted(cells, nkeys), len(cells) - 1)
+        hit = inside & (cells[pos] == nkeys)
+        edges_i.append(np.flatnonzero(hit))
+        edges_j.append(pos[hit])
+    i, j = np.concatenate(edges_i), np.concatenate(edges_j)
+
+    parent = np.arange(len(cells))
+    while True:
+        pi, pj = parent[i], parent[j]
+        differ = pi != pj
+        if not differ.any():
+            return parent
+        # hook the larger root onto the smaller one, then compress the paths
+        np.minimum.at(parent, np.maximum(pi, pj)[differ], np.minimum(pi, pj)[differ])
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
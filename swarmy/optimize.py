@@ -0,0 +1,194 @@
+"""
+Description:
+This module tunes controller parameters (config.yaml entries) automatically.
+Candidate configurations are evaluated as headless experiments on a pool of
+processes and scored by a user defined fitness function. Bad candidates are
+stopped early with successive halving: all candidates run with a short
+max_timestep, only the best fraction continues with a longer one.
+
+Example:
+    space = {'escape_turn_frames': (2, 12, int), 'default_velocity': (1.0, 6.0, float)}
+    opt = Optimizer(config, [MyController], [BumperSensor], My_environment, MyAgent, space, coverage_fitness)
+    best_params, best_score = opt.evolve(generations=10, population=16)
+
+The fitness function gets the finished experiment and returns a score (higher is better).
+It has to be defined at module level, so that it can be sent to the worker processes.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# =============================================================================
+# Class
+# =============================================================================
+class Optimizer():
+    """
+    Parallel parameter search with early stopping.
+
+    Args:
+        config (dict): base configuration, candidates override single entries
+        agent_controller ([class]): controller classes (see Experiment)
+        agent_sensing ([class]): sensor classes
+        world (class): environment class
+        agent (class): agent class
+        space (dict): name -> (low, high, type) search range of every tunable, type is int or float
+        fitness (function): fitness(experiment) -> float, higher is better
+        processes (int): number of worker processes, None = number of cores
+        repeats (int): seeds per evaluation, the score is the mean
+        eta (int): successive halving factor, 1/eta of the candidates survive each rung
+        min_budget (int): max_timestep of the first rung
+    """
+    def __init__(self, config, agent_controller, agent_sensing, world, agent, space, fitness,
+                 processes=None, repeats=1, eta=3, min_budget=None):
+        """
+        Initialize optimizer object.
+        """
+        self.config = config
+        self.spec = (agent_controller, agent_sensing, world, agent)
+        self.space = space
+        self.names = list(space)
+        self.low = np.array([space[n][0] for n in self.names], dtype=float)
+        self.high = np.array([space[n][1] for n in self.names], dtype=float)
+        self.fitness = fitness
+        self.processes = processes
+        self.repeats = repeats
+        self.eta = eta
+
+        # successive halving budgets, e.g. 2000 -> [222, 666, 2000] for eta = 3
+        max_budget = config['max_timestep']
+        min_budget = min_budget or max(1, max_budget // eta ** 2)
+        self.budgets = [max_budget]
+        while self.budgets[0] // eta >= min_budget:
+            self.budgets.insert(0, self.budgets[0] // eta)
+
+        self.rng = np.random.default_rng(config.get('seed'))
+        self.history = []       # (params, budget, score) of every evaluation
+
+    def random_search(self, candidates=64):
+        """
+        Evaluate uniformly sampled candidates.
+
+        Returns: (best parameters, best score)
+        """
+        samples = self.rng.uniform(self.low, self.high, (candidates, len(self.names)))
+        with self._pool() as pool:
+            rank, scores = self.evaluate(pool, samples)
+        best = rank[0]
+        return self.to_params(samples[best]), float(scores[best])
+
+    def evolve(self, generations=10, population=16, parents=None, sigma=0.3):
+        """
+        Evolution strategy in the style of CMA-ES with a diagonal covariance:
+        sample around the mean, recombine the best candidates with log weights,
+        adapt the step size per parameter from the spread of the selected candidates.
+
+        Args:
+            generations (int): number of generations
+            population (int): candidates per generation
+            parents (int): selected candidates per generation, default population // 2
+            sigma (float): initial step size relative to the search range
+        Returns: (best parameters, best score)
+        """
+        parents = parents or population // 2
+        weights = np.log(parents + 0.5) - np.log(np.arange(1, parents + 1))
+        weights /= weights.sum()
+
+        span = self.high - self.low
+        mean = self.rng.uniform(self.low, self.high)
+        std = sigma * span
+        best_x, best_score = None, -np.inf
+        with self._pool() as pool:
+            for _ in range(generations):
+                samples = np.clip(mean + std * self.rng.standard_normal((population, len(self.names))),
+                                  self.low, self.high)
+                rank, scores = self.evaluate(pool, samples)
+                if scores[rank[0]] > best_score:
+                    best_x, best_score = samples[rank[0]], scores[rank[0]]
+
+                selected = samples[rank[:parents]]
+                new_mean = weights @ selected
+                # step size from the weighted spread of the selected candidates around the old mean
+                std = np.sqrt(weights @ (selected - mean) ** 2) + 1e-3 * span
+                mean = new_mean
+        return self.to_params(best_x), float(best_score)
+
+    def evaluate(self, pool, samples):
+        """
+        Evaluate candidates with successive halving.
+
+        Args:
+            pool (ProcessPoolExecutor): worker pool
+            samples (np.ndarray): (K, D) candidate parameter vectors
+        Returns: (candidate indices from best to worst, score of every candidate)
+        """
+        scores = np.full(len(samples), -np.inf)
+        reached = np.zeros(len(samples), dtype=int)       # last rung a candidate was evaluated in
+        alive = np.arange(len(samples))
+        for rung, budget in enumerate(self.budgets):
+            jobs = [(i, pool.submit(_run_candidate, self.config, self.to_params(samples[i]), budget,
+                                    self._seed(r), self.spec, self.fitness))
+                    for i in alive for r in range(self.repeats)]
+            results = {}
+            for i, job in jobs:
+                results.setdefault(i, []).append(job.result())
+            for i in alive:
+                scores[i] = np.mean(results[i])
+                reached[i] = rung
+                self.history.append((self.to_params(samples[i]), budget, scores[i]))
+
+            # keep the best 1/eta for the next rung
+            keep = max(1, len(alive) // self.eta)
+            alive = alive[np.argsort(-scores[alive], kind='stable')[:keep]]
+
+        # candidates that went further rank before the ones stopped early
+        rank = np.lexsort((-scores, -reached))
+        return rank, scores
+
+    def to_params(self, x):
+        """
+        Returns: dict with the config entries of a parameter vector
+        """
+        return {n: self.space[n][2](round(v) if self.space[n][2] is int else v)
+                for n, v in zip(self.names, x.tolist())}
+
+    def _seed(self, repeat):
+        base = self.config.get('seed')
+        return repeat if base is None else base + repeat
+
+    def _pool(self):
+        return ProcessPoolExecutor(max_workers=self.processes)
+
+
+# =============================================================================
+# Fitness functions
+# =============================================================================
+def coverage_fitness(experiment):
+    """
+    Fraction of the arena visited by the swarm (requires coverage_cell_size > 0).
+    """
+    return experiment.world.coverage.fraction()
+
+
+# =============================================================================
+# Worker
+# =============================================================================
+def _run_candidate(config, params, budget, seed, spec, fitness):
+    """
+    Run one headless experiment with the candidate parameters and score it.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from .experiment import Experiment
+
+    config = dict(config, **params)
+    # candidates run headless and without file output or telemetry, parallel workers would overwrite each other;
+    # they are always simulated, the fitness reads the final world and a cache hit leaves it empty
+    config.update(max_timestep=budget, seed=seed, rendering=-1, processes=1, save_trajectory=0, save_coverage=0,
+                  record_trajectory=None, save_metrics=None, telemetry_port=0, result_cache=None)
+    agent_controller, agent_sensing, world, agent = spec
+    experiment = Experiment(config, agent_controller, agent_sensing, world, agent)
+    experiment.run(-1)
+    return float(fitness(experiment))
@@ -0,0 +1,102 @@
+"""
+Description:
+This module includes the debug overlay of the environment.
+Sensors add their geometry (bumper bars, rays, ranges) to flat buffers; once per
+frame the whole buffer is transformed into the camera view and culled as one array,
+and only the visible primitives are drawn in a tight loop over plain tuples.
+The overlay is drawn over the scene after all other objects.
+
+The overlay is only collected while it is shown: press O to toggle it at runtime.
+Sensors should check `enabled` before computing their debug geometry.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import numpy as np
+
+# =============================================================================
+# Class
+# =============================================================================
+class DebugOverlay():
+    """
+    Batched debug drawing layer.
+
+    Args:
+        enabled (bool): collect and draw the overlay
+    """
+    TOGGLE_KEY = ord('o')           # pygame.K_o
+
+    def __init__(self, enabled=False):
+        """
+        Initialize overlay object.
+        """
+        self.enabled = enabled
+        self.lines = []                 # (r, g, b, x0, y0, x1, y1) in world coordinates
+        self.circles = []               # (r, g, b, x, y, radius) in world coordinates
+
+    def add_line(self, color, start, end):
+        """
+        Add one line segment for the current frame.
+        """
+        if self.enabled:
+            self.lines.append((*color, *start, *end))
+
+    def add_circle(self, color, center, radius):
+        """
+        Add one circle outline (e.g. a sensor range) for the current frame.
+        """
+        if self.enabled:
+            self.circles.append((*color, *center, radius))
+
+    def clear(self):
+        self.lines = []
+        self.circles = []
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.clear()
+
+    def handle_event(self, event):
+        """
+        Process one pygame event (toggle key).
+        """
+        import pygame
+        if event.type == pygame.KEYDOWN and event.key == self.TOGGLE_KEY:
+            self.toggle()
+
+    def draw(self, displaySurface, camera):
+        """
+        Draw the collected geometry over the display surface.
+
+        Args:
+            displaySurface (pygame.Surface): screen surface
+            camera (camera.py): camera of the environment
+        """
+        if not self.enabled:
+            return
+        import pygame
+        w, h = displaySurface.get_size()
+        line = pygame.draw.line
+        circle = pygame.draw.circle
+
+        if self.lines:
+            lines = np.array(self.lines, dtype=float)
+            start = camera.to_screen(lines[:, 3:5])
+            end = camera.to_screen(lines[:, 5:7])
+            visible = ((np.maximum(start[:, 0], end[:, 0]) >= 0) & (np.minimum(start[:, 0], end[:, 0]) < w)
+                       & (np.maximum(start[:, 1], end[:, 1]) >= 0) & (np.minimum(start[:, 1], end[:, 1]) < h))
+            colors = lines[visible, :3].astype(np.intp).tolist()
+            segments = np.concatenate((start[visible], end[visible]), axis=1).tolist()
+            for color, (x0, y0, x1, y1) in zip(colors, segments):
+                line(displaySurface, color, (x0, y0), (x1, y1))
+
+        if self.circles:
+            circles = np.array(self.circles, dtype=float)
+            center = camera.to_screen(circles[:, 3:5])
+            radius = np.maximum(circles[:, 5] * camera.zoom, 1)
+            visible = ((center[:, 0] + radius >= 0) & (center[:, 0] - radius < w)
+                       & (center[:, 1] + radius >= 0) & (center[:, 1] - radius < h))
+            colors = circles[visible, :3].astype(np.intp).tolist()
+            for color, c, r in zip(colors, center[visible].tolist(), radius[visible].tolist()):
+                circle(displaySurface, color, c, r, 1)
@@ -0,0 +1,58 @@
+"""
+Description:
+This module updates the agents of one timestep on a persistent pool of threads.
+
+Each timestep has two phases:
+    read    - Environment.update_spatial_index() takes a snapshot of all poses, sensors
+              only look at other agents through this snapshot
+    commit  - every agent moves by writing its own row of the swarm arrays
+No two threads write the same row, so the agents can be updated in any order and
+in parallel. On a free-threaded Python build (3.13t) the speedup is close to the
+number of threads, on a regular build it helps when sensors spend their time in
+NumPy (which releases the GIL).
+
+Controllers and sensors draw random numbers from the generator of their agent
+(self.random), so a seeded threaded run gives the same result as a serial one.
+The global random module is shared by all threads and must not be used.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+from concurrent.futures import ThreadPoolExecutor
+from .experiment import step_agents
+
+# =============================================================================
+# Class
+# =============================================================================
+class AgentThreadPool():
+    """
+    Persistent thread pool that updates the agents in contiguous partitions.
+
+    Args:
+        threads (int): number of worker threads (partitions)
+    """
+    def __init__(self, threads):
+        """
+        Initialize and start the thread pool.
+        """
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='swarmy-agents')
+
+    def step(self, agents, pressedKeys, timestep, seed=None):
+        """
+        Update all agents for one timestep, returns when every partition is done.
+        """
+        if not agents:
+            return
+        size = -(-len(agents) // self.threads)          # ceil division
+        futures = [self.executor.submit(step_agents, agents[i:i + size], pressedKeys, timestep, seed)
+                   for i in range(0, len(agents), size)]
+        for future in futures:
+            future.result()                             # re-raises exceptions of the agents
+
+    def shutdown(self):
+        """
+        Stop the worker threads.
+        """
+        self.executor.shutdown(wait=True)
@@ -13,9 +13,6 @@ This module includes all perception possibilites of an agent.
 # Imports
 # =============================================================================
 from abc import abstractmethod
-
-import pygame
-import math
 # =============================================================================
 # Class
 # =============================================================================
@@ -29,8 +26,17 @@ class Perception():
     
     Available sensors:
         Your light sensor
+
+    Scheduling:
+        A sensor is evaluated every update_period timesteps and holds its last value in between.
+        The evaluation step of each agent is shifted by its unique_id (plus phase_offset), so the
+        agents of the swarm evaluate an expensive sensor in different timesteps.
+        Within one timestep the result is cached, repeated reads do not call sensor() again.
     
     """
+    update_period = 1       # evaluate every n-th timestep (1 = every timestep)
+    phase_offset = 0        # additional shift of the evaluation step
+
     def __init__(self, a, e):
         
         """
@@ -40,7 +46,32 @@ class Perception():
         # variables        
         self.agent = a
         self.env = e
+        self.value = None           # cached sensor result
+        self.lastUpdate = None      # timestep of the cached result
 
+    @property
+    def random(self):
+        """
+        Random generator of the agent (use it instead of the random module, see experiment.step_agents)
+        """
+        return self.agent.random
+
+    def read(self):
+        """
+        Scheduled and cached access to sensor().
+
+        Returns: sensor value of the last evaluation
+        """
+        t = self.env.timestep
+        if t == self.lastUpdate:
+            return self.value
+        if self.lastUpdate is not None and self.update_period > 1:
+            stagger = (self.agent.unique_id or 0) + self.phase_offset
+            if (t + stagger) % self.update_period != 0:
+                return self.value
+        self.value = self.sensor()
+        self.lastUpdate = t
+        return self.value
 
     @abstractmethod
     def Sensor(self):
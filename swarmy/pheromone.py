@@ -0,0 +1,199 @@
+"""
+Description:
+This module includes a pheromone field for stigmergy experiments (e.g. ant trails).
+The world is divided into square cells holding the pheromone concentration.
+Agents deposit into the field and sense from it; deposits are queued and applied
+with one scatter-add per timestep, and the values under all agents are gathered
+in one batch on first use. Every timestep the whole grid diffuses (separable
+[1 2 1] stencil) and evaporates.
+
+The field is drawn below the static objects from a cached, color-mapped layer with
+one pixel per cell; only the cells inside the camera view are scaled to the screen.
+
+Example (in a controller):
+    pheromone = self.agent.environment.pheromone
+    x, y, _ = self.agent.get_position()
+    pheromone.deposit(x, y, 1.0)
+    here = pheromone.sample(x, y)
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import math
+import numpy as np
+
+# =============================================================================
+# Class
+# =============================================================================
+class PheromoneField():
+    """
+    Grid-based pheromone layer of the environment.
+
+    Args:
+        width (int): world width in pixels
+        height (int): world height in pixels
+        cell_size (int): edge length of one grid cell in pixels
+        diffusion (float): fraction of each cell exchanged with its neighbours per timestep (0..1)
+        evaporation (float): fraction of the pheromone that evaporates per timestep (0..1)
+        periodic (bool): the field wraps around the world borders (torus topology)
+    """
+    def __init__(self, width, height, cell_size, diffusion=0.1, evaporation=0.01, periodic=False):
+        """
+        Initialize pheromone field object.
+        """
+        self.cell_size = cell_size
+        self.cols = max(2, math.ceil(width / cell_size))
+        self.rows = max(2, math.ceil(height / cell_size))
+        self.diffusion = diffusion
+        self.evaporation = evaporation
+        self.periodic = periodic
+
+        self.values = np.zeros((self.rows, self.cols))      # concentration, row index is y
+        self.blurX = np.empty_like(self.values)             # work buffers of the diffusion
+        self.blurXY = np.empty_like(self.values)
+        self.pending = []                                    # queued deposits (x, y, amount)
+        self.version = 0                                     # number of updates, invalidates the render layer
+
+        self.agentValues = np.zeros(0)                       # values under all agents (see agent_values)
+        self.agentValuesStep = None
+        self.layer = None                                    # cached render layer (one pixel per cell)
+        self.layerVersion = -1
+        self.screenLayer = None                              # visible part of the layer scaled to the screen
+        self.screenKey = None                                # layer version and camera view of screenLayer
+
+    def cells_of(self, positions):
+        """
+        Returns: row and column index arrays of the cells containing the positions
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        cx = (positions[:, 0] // self.cell_size).astype(np.intp)
+        cy = (positions[:, 1] // self.cell_size).astype(np.intp)
+        if self.periodic:
+            return cy % self.rows, cx % self.cols
+        return np.clip(cy, 0, self.rows - 1), np.clip(cx, 0, self.cols - 1)
+
+#%% Deposits and reads
+
+    def deposit(self, x, y, amount=1.0):
+        """
+        Queue a deposit, it is added to the field in the next update().
+        """
+        self.pending.append((x, y, amount))
+
+    def deposit_many(self, positions, amounts):
+        """
+        Add deposits at many positions at once (scatter-add).
+
+        Args:
+            positions (np.ndarray): (N, 2) x-y positions
+            amounts (float or np.ndarray): amount per position
+        """
+        cy, cx = self.cells_of(positions)
+        np.add.at(self.values, (cy, cx), amounts)
+
+    def sample(self, x, y):
+        """
+        Returns: concentration at one position
+        """
+        cy, cx = self.cells_of((x, y))
+        return float(self.values[cy[0], cx[0]])
+
+    def sample_many(self, positions):
+        """
+        Returns: (N,) concentrations at many positions (gather)
+        """
+        return self.values[self.cells_of(positions)]
+
+    def agent_values(self, environment):
+        """
+        Concentration under every agent, gathered once per timestep from the pose snapshot.
+
+        Returns: (N,) array indexed by agent slot
+        """
+        if self.agentValuesStep != environment.timestep:
+            self.agentValues = self.sample_many(environment.agentGrid.points)
+            self.agentValuesStep = environment.timestep
+        return self.agentValues
+
+#%% Dynamics
+
+    def update(self):
+        """
+        Apply the queued deposits, then diffuse and evaporate for one timestep.
+        """
+        if self.pending:
+            deposits = np.array(self.pending, dtype=float)
+            self.pending = []
+            self.deposit_many(deposits[:, :2], deposits[:, 2])
+
+        if self.diffusion > 0:
+            # separable [1 2 1] / 4 blur, mixed with the current values by the diffusion rate
+            _blur_axis(self.values, self.blurX, self.periodic)
+            _blur_axis(self.blurX.T, self.blurXY.T, self.periodic)
+            self.values *= 1 - self.diffusion
+            self.blurXY *= self.diffusion
+            self.values += self.blurXY
+        if self.evaporation > 0:
+            self.values *= 1 - self.evaporation
+        self.version += 1
+
+#%% Rendering
+
+    def draw(self, surface, camera, color=(150, 0, 200), saturation=10.0, interval=5):
+        """
+        Blit the color-mapped field, the layer is rebuilt at most every interval updates.
+
+        Args:
+            surface (pygame.Surface): display surface
+            camera (camera.py): camera of the environment
+            color ((int, int, int)): color of the pheromone, the opacity shows the concentration
+            saturation (float): concentration drawn fully opaque
+            interval (int): updates between two rebuilds of the layer
+        """
+        import pygame
+        if self.layer is None or self.version - self.layerVersion >= interval:
+            alpha = np.clip(self.values * (255 / saturation), 0, 255).astype(np.uint8)
+            self.layer = pygame.Surface((self.cols, self.rows), pygame.SRCALPHA)
+            self.layer.fill(color)
+            view = pygame.surfarray.pixels_alpha(self.layer)
+            view[:] = alpha.T
+            del view                                        # unlock the surface
+            self.layerVersion = self.version
+
+        # the cells inside the camera view are scaled to the screen, again only if the layer or the view changed
+        key = (self.layerVersion, camera.x, camera.y, camera.zoom, camera.screen_w, camera.screen_h)
+        if key != self.screenKey:
+            self.screenKey = key
+            self.screenLayer = None
+            cs = self.cell_size
+            x0, y0, x1, y1 = camera.view_rect()
+            cells = pygame.Rect(math.floor(x0 / cs), math.floor(y0 / cs), 0, 0)
+            cells.width = math.ceil(x1 / cs) - cells.left
+            cells.height = math.ceil(y1 / cs) - cells.top
+            cells = cells.clip(self.layer.get_rect())
+            if cells.width and cells.height:
+                target = camera.rect_to_screen(pygame.Rect(cells.left * cs, cells.top * cs, cells.width * cs, cells.height * cs))
+                self.screenLayer = (pygame.transform.smoothscale(self.layer.subsurface(cells), target.size), target.topleft)
+        if self.screenLayer is not None:
+            surface.blit(*self.screenLayer)
+
+
+# =============================================================================
+# Helper functions
+# =============================================================================
+def _blur_axis(src, dst, periodic):
+    """
+    dst = [1 2 1] / 4 stencil of src along the last axis.
+    The borders are mirrored (no flux) or wrapped (periodic), the total amount is preserved.
+    """
+    dst[:, 1:-1] = src[:, :-2]
+    dst[:, 1:-1] += src[:, 2:]
+    dst[:, 1:-1] += 2 * src[:, 1:-1]
+    if periodic:
+        dst[:, 0] = src[:, -1] + 2 * src[:, 0] + src[:, 1]
+        dst[:, -1] = src[:, -2] + 2 * src[:, -1] + src[:, 0]
+    else:
+        dst[:, 0] = 3 * src[:, 0] + src[:, 1]
+        dst[:, -1] = src[:, -2] + 3 * src[:, -1]
+    dst *= 0.25
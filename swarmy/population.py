@@ -0,0 +1,97 @@
+"""
+Description:
+This module adds and removes agents while an experiment is running
+(robot failure, energy death, reproduction).
+
+The swarm arrays stay dense: a removed agent's slot is filled with the agent
+from the last slot (swap-remove), and the slots behind agent_count are the free
+list that new agents take. Both operations cost O(1). Each agent keeps its
+unique_id for its whole life, ids are never reused.
+
+Requests are queued and applied at the start of the next timestep (commit), so agents can
+add or remove agents, including themselves, from inside their controller:
+    self.agent.environment.population.remove(self.agent.unique_id)
+
+The population can not change when the experiment is split across processes
+(processes > 1), environment.population is None in that mode.
+"""
+
+# =============================================================================
+# Class
+# =============================================================================
+class Population():
+    """
+    Population manager of an experiment.
+
+    Args:
+        experiment (experiment.py): experiment that provides the agent, controller and sensor classes
+        environment (environment.py): environment with the swarm arrays
+    """
+    def __init__(self, experiment, environment):
+        """
+        Initialize population object with the agents created by the experiment.
+        """
+        self.experiment = experiment
+        self.environment = environment
+        self.agents = environment.agentlist                 # index = slot, shared with the experiment
+        self.slotOf = {agent.unique_id: slot for slot, agent in enumerate(self.agents)}
+        self.nextId = len(self.agents)
+        self.pendingSpawns = []
+        self.pendingRemovals = []
+
+    def __len__(self):
+        return len(self.agents)
+
+    def get(self, unique_id):
+        """
+        Returns: the agent with the given unique_id
+        """
+        return self.agents[self.slotOf[unique_id]]
+
+    def spawn(self, pose=None, controller=None):
+        """
+        Request a new agent, it is created at the start of the next timestep.
+
+        Args:
+            pose ((float, float, float)): x, y, heading; None = agent.initial_position()
+            controller (class): controller class, None = first controller of the experiment
+        Returns: unique_id of the new agent
+        """
+        unique_id = self.nextId
+        self.nextId += 1
+        self.pendingSpawns.append((unique_id, pose, controller or self.experiment.agent_controller[0]))
+        return unique_id
+
+    def remove(self, unique_id):
+        """
+        Request the removal of an agent at the start of the next timestep.
+        """
+        self.pendingRemovals.append(unique_id)
+
+    def commit(self):
+        """
+        Apply all queued removals and spawns, called before the spatial index is built.
+        """
+        for unique_id in self.pendingRemovals:
+            slot = self.slotOf.pop(unique_id, None)
+            if slot is None:
+                continue                                    # removed twice
+            last = len(self.agents) - 1
+            self.environment.remove_agent_slot(slot)
+            self.agents[slot] = self.agents[last]
+            self.agents.pop()
+            if slot != last:
+                self.slotOf[self.agents[slot].unique_id] = slot
+        self.pendingRemovals = []
+
+        experiment = self.experiment
+        for unique_id, pose, controller in self.pendingSpawns:
+            newAgent = experiment.agent(self.environment, controller, experiment.agent_sensing, experiment.config)
+            newAgent.unique_id = unique_id
+            if pose is None:
+                newAgent.initial_position()
+            else:
+                newAgent.set_position(*pose)
+            self.slotOf[unique_id] = newAgent.actuation.slot
+            self.agents.append(newAgent)
+        self.pendingSpawns = []
@@ -7,11 +7,29 @@
 """
 Description:
 This module includes all computation procedures of an agent, e.g. its behavior in perform()
+
+One timestep of an agent is a pipeline of stages, methods of its actuation object
+called in the configured order (processing_stages in config.yaml):
+
+    input       processUserInput(pressedKeys), only for the teleoperated agent (teleop_agent)
+    torus       torus()
+    controller  controller()
+    <name>      any other method of the controller class, e.g. a custom stage
+
+Stages that would do nothing are compiled out once per controller class: methods the
+controller does not implement (abstract methods of actuation.py) and methods with an
+empty body (only pass or a docstring).
 """
 
 # =============================================================================
 # Imports
 # =============================================================================
+import dis
+
+STAGE_METHODS = {'input': 'processUserInput', 'torus': 'torus', 'controller': 'controller'}
+DEFAULT_STAGES = ('input', 'torus', 'controller')
+
+_pipelines = {}         # (controller class, stages, teleop agent) -> compiled pipeline
 
 # =============================================================================
 # Class
@@ -23,28 +41,70 @@ class Processing():
     Args:
         a (agent.py): instance of the agent
     """    
+    __slots__ = ('agent', 'pipeline')      # two references per agent, no instance dict
+
     def __init__(self, a):
         """
         Initialize processing object.
         """    
         self.agent = a
+        config = a.environment.config
+        self.pipeline = compile_pipeline(type(a.actuation), tuple(config.get('processing_stages') or DEFAULT_STAGES),
+                                         config.get('teleop_agent', 0))
 
     def perform(self, pressedKeys):
         """
         Update agent processing for one timestep
         """     
-        #self.agent.actuation.stepForward()
-        #self.agent.actuation.fear()
-        #self.agent.actuation.aggression()
-        self.agent.actuation.processUserInput(pressedKeys)
-        self.agent.actuation.torus()
-        self.agent.actuation.controller()
+        actuation = self.agent.actuation
+        before, teleop, after = self.pipeline
+        for stage in before:
+            stage(actuation)
+        if teleop == self.agent.unique_id and pressedKeys:
+            actuation.processUserInput(pressedKeys)
+        for stage in after:
+            stage(actuation)
 
 
-    
-        
-        
-        
-    
-        
-        
\ No newline at end of file
+# =============================================================================
+# Helper functions
+# =============================================================================
+def compile_pipeline(controller, stages=DEFAULT_STAGES, teleop_agent=0):
+    """
+    Resolve the stages of a controller class, skip the stages without work (cached per class).
+
+    Args:
+        controller (class): controller class (subclass of actuation.py)
+        stages ((str, ...)): stage names in the order of execution
+        teleop_agent (int): unique_id of the agent that receives the keyboard input, None = none
+    Returns: (stages before the input stage, teleop agent or None, stages after the input stage)
+    """
+    key = (controller, stages, teleop_agent)
+    if key in _pipelines:
+        return _pipelines[key]
+    before, after = [], []
+    teleop = None
+    for name in stages:
+        method = STAGE_METHODS.get(name, name)
+        function = getattr(controller, method, None)
+        if not callable(function):
+            raise ValueError("unknown processing stage '{}' of {}".format(name, controller.__name__))
+        if getattr(function, '__isabstractmethod__', False) or _is_empty(function):
+            continue
+        if method == 'processUserInput':
+            teleop = teleop_agent
+        else:
+            (before if teleop is None else after).append(function)
+    _pipelines[key] = (tuple(before), teleop, tuple(after))
+    return _pipelines[key]
+
+
+def _is_empty(function):
+    """
+    Returns: True if the function body does nothing (only pass or a docstring)
+    """
+    code = getattr(function, '__code__', None)
+    if code is None:
+        return False
+    ops = [(i.opname, i.argval) for i in dis.get_instructions(code) if i.opname not in ('RESUME', 'NOP')]
+    return ops in ([('RETURN_CONST', None)], [('LOAD_CONST', None), ('RETURN_VALUE', None)])
@@ -0,0 +1,195 @@
+"""
+Description:
+This module includes a renderer that draws into a NumPy RGB array instead of a display
+(rendering: 2), for image datasets on display-less machines.
+The background and the static objects are rasterized once. Every frame the background
+is copied into the frame buffer and all items and agents are stamped into it with
+one vectorized scatter each: the agent body is pre-rasterized for every heading bin
+as a list of pixel offsets (sprites).
+
+The frame is the whole world, one pixel per world unit. Only static objects, items
+and agents are drawn (no dynamic user objects, no debug overlay).
+
+Example:
+    def save_frame(timestep, frame):        # frame: (height, width, 3) uint8, reused every frame
+        np.save('frames/{:06d}.npy'.format(timestep), frame)
+    Experiment(config, [MyController], [BumperSensor], My_environment, MyAgent, frame_callback=save_frame).run(2)
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import pygame
+import numpy as np
+from . import body
+from .body import Body, heading_bins
+
+# =============================================================================
+# Class
+# =============================================================================
+class PixelRenderer():
+    """
+    Software renderer into a (height, width, 3) uint8 array.
+
+    Args:
+        environment (environment.py): environment with its static objects
+    """
+    OUTLINE_WIDTH = 3               # outline width of the agent bodies (as in Environment.render)
+    SENTINEL = (255, 0, 255)        # fill color of the sprite canvas, marks pixels outside the body
+
+    def __init__(self, environment):
+        """
+        Initialize renderer, rasterize the static scene and the agent sprites.
+        """
+        self.environment = environment
+        self.background = self.rasterize_static()
+        self.frame = self.background.copy()             # frame buffer, handed to the caller without copying
+
+        template = Body(None)
+        if len(body.polyRotatedLookUp) == 0:
+            template.helperLUT()
+        self.defaultColor = np.array(template.COLOR, dtype=np.uint8)
+        self.fillSprites, self.outlineSprites = self.rasterize_sprites(body.polyRotatedLookUp)
+        self.discs = {}                                 # radius -> (1, K, 2) pixel offsets of a filled circle
+
+    def rasterize_static(self):
+        """
+        Draw background and static objects once with pygame into an off-screen surface.
+
+        Returns: (height, width, 3) uint8 array
+        """
+        environment = self.environment
+        surface = pygame.Surface((environment.width, environment.height))
+        display = getattr(environment, 'displaySurface', None)
+        environment.displaySurface = surface            # the world may paint its own background
+        try:
+            environment.set_background_color()
+        finally:
+            environment.displaySurface = display
+        for x in environment.staticRectList:
+            pygame.draw.rect(surface, x[0], x[1], x[2])
+        for x in environment.staticCircList:
+            pygame.draw.circle(surface, x[0], x[1], x[2], x[3])
+        return np.ascontiguousarray(pygame.surfarray.array3d(surface).transpose(1, 0, 2))
+
+    def rasterize_sprites(self, polygons):
+        """
+        Rasterize the rotated reference polygon of every heading bin.
+        Sprites are padded to the same length by repeating their first pixel.
+
+        Args:
+            polygons (np.ndarray): (LUT_BINS, V, 2) rotated polygons around the origin
+        Returns: (LUT_BINS, M, 2) pixel offsets (x, y) of the white fill and (LUT_BINS, K, 2) of the colored outline
+        """
+        half = int(np.ceil(np.abs(polygons).max())) + self.OUTLINE_WIDTH
+        self.spriteReach = half
+        size = 2 * half + 1
+        canvas = pygame.Surface((size, size))
+        fills, outlines = [], []
+        for poly in polygons + half:
+            canvas.fill(self.SENTINEL)
+            pygame.draw.polygon(canvas, (255, 255, 255), poly)
+            pygame.draw.polygon(canvas, (0, 0, 0), poly, self.OUTLINE_WIDTH)
+            pixels = pygame.surfarray.array3d(canvas)
+            xs, ys = np.nonzero(np.any(pixels != self.SENTINEL, axis=2))
+            offsets = np.stack((xs, ys), axis=1) - half
+            outline = pixels[xs, ys, 0] == 0
+            fills.append(offsets[~outline])
+            outlines.append(offsets[outline])
+        return _pad(fills), _pad(outlines)
+
+    def disc(self, radius):
+        """
+        Returns: (1, K, 2) pixel offsets of a filled circle (cached per radius)
+        """
+        if radius not in self.discs:
+            r = int(np.ceil(radius))
+            ys, xs = np.mgrid[-r:r + 1, -r:r + 1]
+            inside = xs * xs + ys * ys <= radius * radius
+            self.discs[radius] = np.stack((xs[inside], ys[inside]), axis=1)[None]
+        return self.discs[radius]
+
+    def render(self):
+        """
+        Draw the current state into the frame buffer.
+        The outlines of all agents are drawn after the fills of all agents.
+
+        Returns: frame buffer, (height, width, 3) uint8 array (overwritten by the next call)
+        """
+        environment = self.environment
+        frame = self.frame
+        np.copyto(frame, self.background)
+
+        items = environment.items
+        for radius in np.unique(items.radii).tolist():
+            idx = np.flatnonzero(items.radii == radius)
+            self.stamp(frame, items.positions[idx], self.disc(radius), items.colors[idx], int(np.ceil(radius)))
+
+        n = environment.agent_count
+        if n:
+            positions = environment.get_agent_positions()
+            bins = heading_bins(environment.get_agent_headings())
+            if len(environment.agentlist) >= n:
+                colors = np.array([agent.body.COLOR for agent in environment.agentlist[:n]], dtype=np.uint8)
+            else:
+                colors = np.broadcast_to(self.defaultColor, (n, 3))
+            self.stamp(frame, positions, self.fillSprites[bins], np.broadcast_to(WHITE, (n, 3)), self.spriteReach)
+            self.stamp(frame, positions, self.outlineSprites[bins], colors, self.spriteReach)
+        return frame
+
+    def stamp(self, frame, positions, offsets, colors, reach):
+        """
+        Write single-colored shapes into the frame with one scatter.
+        Shapes fully inside the frame are written through precomputed flat indices,
+        only shapes on the border are wrapped (torus) or clipped.
+
+        Args:
+            frame (np.ndarray): (H, W, 3) frame buffer
+            positions (np.ndarray): (N, 2) shape centers in world coordinates
+            offsets (np.ndarray): (N, M, 2) or (1, M, 2) pixel offsets of the shapes
+            colors (np.ndarray): (N, 3) color of each shape
+            reach (int): largest absolute pixel offset of the shapes
+        """
+        height, width = frame.shape[:2]
+        center = np.rint(positions).astype(np.intp)
+        inside = ((center[:, 0] >= reach) & (center[:, 0] < width - reach)
+                  & (center[:, 1] >= reach) & (center[:, 1] < height - reach))
+        shared = len(offsets) == 1
+
+        if inside.any():
+            o = offsets if shared else offsets[inside]
+            c = center[inside]
+            flat = (c[:, 1] * width + c[:, 0])[:, None] + o[..., 1] * width + o[..., 0]
+            frame.reshape(-1, 3)[flat] = colors[inside][:, None]
+
+        border = ~inside
+        if border.any():
+            o = offsets if shared else offsets[border]
+            c = center[border]
+            xs = c[:, 0, None] + o[..., 0]
+            ys = c[:, 1, None] + o[..., 1]
+            pixelColors = np.broadcast_to(colors[border][:, None], xs.shape + (3,))
+            if self.environment.torus:
+                frame[ys % height, xs % width] = pixelColors
+            else:
+                keep = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+                frame[ys[keep], xs[keep]] = pixelColors[keep]
+
+
+# =============================================================================
+# Helper functions
+# =============================================================================
+WHITE = np.array((255, 255, 255), dtype=np.uint8)
+
+
+def _pad(sprites):
+    """
+    Stack offset lists of different length, shorter ones repeat their first pixel.
+
+    Returns: (len(sprites), M, 2) array
+    """
+    m = max(len(o) for o in sprites)
+    padded = np.zeros((len(sprites), m, 2), dtype=np.intp)
+    for k, o in enumerate(sprites):
+        padded[k] = o[np.minimum(np.arange(m), len(o) - 1)] if len(o) else 0
+    return padded
@@ -0,0 +1,113 @@
+"""
+Description:
+This module records the trajectories of an experiment to a binary file and reads them back.
+
+File layout:
+    8 bytes     magic b'SWARMYTR'
+    4 bytes     length L of the header (little endian uint32)
+    L bytes     JSON header (number of agents and items, world size, topology)
+    frames      one float32 row per timestep: x, y, heading of every agent,
+                followed by x, y of every item
+
+The number of agent rows is fixed by the swarm size at the start. If agents are
+removed during the run, the unused rows are NaN; agents beyond the initial swarm
+size are not recorded.
+
+All frames have the same size, so a frame is found by its index without reading
+the frames before it and the reader maps the file lazily (np.memmap).
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import json
+import os
+import struct
+import numpy as np
+
+MAGIC = b'SWARMYTR'
+
+# =============================================================================
+# Class
+# =============================================================================
+class TrajectoryRecorder():
+    """
+    Appends one frame per timestep to a trajectory file.
+
+    Args:
+        path (str): output file name
+        environment (environment.py): environment of the experiment (agents must be created)
+    """
+    def __init__(self, path, environment):
+        """
+        Initialize recorder and write the header.
+        """
+        self.environment = environment
+        self.n_agents = environment.agent_count
+        self.n_items = len(environment.items)
+        header = json.dumps({'agents': self.n_agents, 'items': self.n_items,
+                             'width': environment.width, 'height': environment.height,
+                             'topology': 'torus' if environment.torus else 'bounded'}).encode()
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self.frame = np.zeros(3 * self.n_agents + 2 * self.n_items, dtype=np.float32)
+
+    def record(self):
+        """
+        Append the current poses as one frame.
+        """
+        n = self.n_agents
+        alive = min(n, self.environment.agent_count)
+        agents = self.frame[:3 * n].reshape(n, 3)
+        agents[:alive, :2] = self.environment.get_agent_positions()[:alive]
+        agents[:alive, 2] = self.environment.get_agent_headings()[:alive]
+        agents[alive:] = np.nan
+        if self.n_items:
+            self.frame[3 * n:] = self.environment.items.positions.ravel()
+        self.file.write(self.frame.tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+class TrajectoryReader():
+    """
+    Lazy random access to the frames of a trajectory file.
+
+    Args:
+        path (str): trajectory file written by TrajectoryRecorder
+    """
+    def __init__(self, path):
+        """
+        Initialize reader, only the header is read.
+        """
+        with open(path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError('{} is not a swarmy trajectory file'.format(path))
+            (length,) = struct.unpack('<I', file.read(4))
+            self.header = json.loads(file.read(length))
+        self.n_agents = self.header['agents']
+        self.n_items = self.header['items']
+        frame_len = 3 * self.n_agents + 2 * self.n_items
+        offset = len(MAGIC) + 4 + length
+        n_frames = (os.path.getsize(path) - offset) // (4 * frame_len)      # an incomplete last frame is ignored
+        if n_frames == 0:
+            raise ValueError('{} contains no frames'.format(path))
+        self.frames = np.memmap(path, dtype=np.float32, mode='r', offset=offset, shape=(n_frames, frame_len))
+
+    def __len__(self):
+        return len(self.frames)
+
+    def agents(self, index):
+        """
+        Returns: (N, 2) positions and (N,) headings of frame index (only rows of living agents)
+        """
+        poses = self.frames[index, :3 * self.n_agents].reshape(self.n_agents, 3)
+        poses = poses[np.isfinite(poses[:, 0])]
+        return poses[:, :2].astype(float), poses[:, 2].astype(float)
+
+    def items(self, index):
+        """
+        Returns: (M, 2) item positions of frame index
+        """
+        return self.frames[index, 3 * self.n_agents:].reshape(self.n_items, 2).astype(float)
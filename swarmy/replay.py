@@ -0,0 +1,117 @@
+"""
+Description:
+This module plays back a recorded trajectory file (see recording.py) without simulating.
+Only the rendering pipeline runs: the recorded poses are written into the swarm arrays
+of the environment, the body polygons are built in one batch and Environment.render draws them.
+Frames are read lazily from disk, so long recordings open instantly.
+
+Controls:
+    Space               pause / play
+    Left, Right         previous / next frame (pauses)
+    Up, Down            double / halve the playback speed
+    Page Up, Page Down  jump back / forward by 10% of the recording
+    Home, End           jump to the first / last frame
+    Esc                 quit
+    W, A, S, D, mouse   camera (see camera.py)
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import pygame
+import numpy as np
+from . import body
+from .body import Body, swarm_polygons
+from .recording import TrajectoryReader
+
+# =============================================================================
+# Class
+# =============================================================================
+class Replay():
+    """
+    Replay viewer for trajectory files.
+
+    Args:
+        config (dict): configuration (world size, FPS, rendering)
+        world (class): environment class used for the recording
+        path (str): trajectory file
+    """
+    def __init__(self, config, world, path):
+        """
+        Initialize replay object.
+        """
+        self.config = config
+        self.reader = TrajectoryReader(path)
+        self.world = world(config)
+
+    def run(self):
+        """
+        Open the window and play the recording until Esc or window close.
+        """
+        pygame.init()
+        environment = self.world
+        environment.render_init()
+        reader = self.reader
+        last = len(reader) - 1
+
+        # agent bodies without agents: one body provides the lookup table and the color
+        template = Body(None)
+        if len(body.polyRotatedLookUp) == 0:
+            template.helperLUT()
+        show_items = reader.n_items == len(environment.items)
+        all_items = np.arange(reader.n_items)
+
+        frame = 0.0
+        speed = 1.0
+        paused = False
+        running = True
+        while running:
+            for event in pygame.event.get():
+                environment.camera.handle_event(event)
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        running = False
+                    elif event.key == pygame.K_SPACE:
+                        paused = not paused
+                    elif event.key == pygame.K_RIGHT:
+                        paused, frame = True, min(int(frame) + 1, last)
+                    elif event.key == pygame.K_LEFT:
+                        paused, frame = True, max(int(frame) - 1, 0)
+                    elif event.key == pygame.K_UP:
+                        speed = min(speed * 2, 64.0)
+                    elif event.key == pygame.K_DOWN:
+                        speed = max(speed / 2, 1 / 16)
+                    elif event.key == pygame.K_PAGEUP:
+                        frame = max(frame - 0.1 * len(reader), 0)
+                    elif event.key == pygame.K_PAGEDOWN:
+                        frame = min(frame + 0.1 * len(reader), last)
+                    elif event.key == pygame.K_HOME:
+                        frame = 0
+                    elif event.key == pygame.K_END:
+                        frame = last
+            environment.camera.processUserInput(pygame.key.get_pressed())
+
+            if not paused:
+                frame = min(frame + speed, last)
+            index = int(frame)
+
+            # recorded poses into the swarm arrays, then the usual render path
+            positions, headings = reader.agents(index)
+            environment.attach_state_arrays(positions, headings)
+            environment.agent_count = len(positions)
+            environment.timestep = index + 1
+            environment.update_spatial_index()
+            visible = environment.visible_agents()
+            for poly in swarm_polygons(positions[visible], headings[visible]):
+                environment.dynamicPolyList.append([template.COLOR, poly, 3])
+            if show_items:
+                environment.items.positions = reader.items(index)
+                environment.items.reindex(all_items)
+
+            pygame.display.set_caption('swarmy replay - frame {}/{} - speed {:g}x{}'.format(
+                index + 1, last + 1, speed, ' (paused)' if paused else ''))
+            environment.render()
+
+        pygame.quit()
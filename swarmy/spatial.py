@@ -0,0 +1,539 @@
+"""
+Description:
+This module includes the spatial indices of the environment.
+Agents are stored in a uniform grid that is rebuilt with a few vectorized
+operations every timestep, static objects in a bucket grid that is built once.
+
+The agent grid tunes itself: every few builds it estimates the cost of a typical
+radius query from the current bucket occupancy for its cell size, half and double
+of it, and for a sort-and-sweep on x, and switches to the cheapest. Dense clusters
+shrink the cells, dispersal grows them, and very uneven distributions fall back to
+the sweep, so the query cost stays flat while the swarm aggregates or disperses.
+
+Batch neighbour queries (radius_neighbors, nearest_neighbors) answer the queries of
+all agents at once: the points are sorted into a grid with cells of at least the
+search radius, the candidate pairs of the 3x3 cell blocks are expanded and reduced
+to the closest neighbours of every query in a few vectorized operations.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import math
+import numpy as np
+
+MAX_AXIS_CELLS = 1 << 12        # cells per axis of the batch query grids, tiny radii do not need more
+
+# =============================================================================
+# Class
+# =============================================================================
+class SpatialGrid():
+    """
+    Uniform grid over point positions (agents).
+    The points are sorted by their row-major cell key, so all points of a cell
+    row segment form one contiguous block that is found with a binary search.
+
+    Args:
+        width (int): world width in pixels
+        height (int): world height in pixels
+        cell_size (int): initial edge length of one grid cell in pixels
+        periodic (bool): wrap cell indices around the world borders (torus topology)
+        tuning_interval (int): re-tune cell size and query mode every n builds, 0 = fixed cell size
+    """
+    MIN_CELL_SIZE = 8           # smallest cell edge the tuning may choose
+    MAX_CELLS = 1 << 20         # largest number of cells the tuning may choose
+    SCALES = (1/16, 1/8, 1/4, 1/2, 1, 2, 4)  # cell sizes tried by the tuning, relative to the initial cell size
+    ROW_COST = 60.0             # cost of one cell row segment of a grid query, in candidates (measured)
+    SWEEP_COST = 0.2            # cost of one x-band point of the sweep (a y comparison), in candidates (measured)
+    HYSTERESIS = 0.8            # a new configuration must be at least 20% cheaper than the current one
+
+    def __init__(self, width, height, cell_size, periodic=False, tuning_interval=0):
+        """
+        Initialize spatial grid object.
+        """
+        self.width = width
+        self.height = height
+        self.periodic = periodic
+        self.tuning_interval = tuning_interval
+        self.initialCellSize = cell_size
+        self.set_cell_size(cell_size)
+        self.mode = 'grid'                              # 'grid' or 'sweep' (radius and rectangle queries)
+        self.queryRadius = cell_size / 2                # radius of the last radius query, used by the tuning
+        self.builds = 0
+
+        self.points = np.zeros((0, 2))                  # positions at the time of the last build
+        self.cover = None                               # x range whose points are all indexed, None = all points
+        self.order = np.zeros(0, dtype=np.intp)         # point indices sorted by cell key
+        self.sortedKeys = np.zeros(0, dtype=np.intp)    # cell keys in the same order
+        self.xOrder = np.zeros(0, dtype=np.intp)        # point indices sorted by x (sweep mode)
+        self.sortedX = np.zeros(0)                      # x coordinates in the same order
+
+    def set_cell_size(self, cell_size):
+        """
+        Change the cell size, takes effect with the next build.
+        On a torus the cells are stretched to cellWidth x cellHeight (see axis_cells).
+        """
+        self.cell_size = cell_size
+        self.cols, self.cellWidth = axis_cells(self.width, cell_size, self.periodic)
+        self.rows, self.cellHeight = axis_cells(self.height, cell_size, self.periodic)
+
+    def cell_of(self, positions):
+        """
+        Returns: column and row index arrays of the cells containing the positions
+        """
+        cx = (positions[:, 0] // self.cellWidth).astype(np.intp)
+        cy = (positions[:, 1] // self.cellHeight).astype(np.intp)
+        if self.periodic:
+            return cx % self.cols, cy % self.rows
+        return np.clip(cx, 0, self.cols - 1), np.clip(cy, 0, self.rows - 1)
+
+    def build(self, positions, ids=None, cover=None):
+        """
+        Rebuild the grid from scratch.
+        A copy of the positions is kept, so queries see a consistent snapshot
+        while the agents keep moving during the timestep.
+
+        Args:
+            positions (np.ndarray): (N, 2) array of x-y positions
+            ids (np.ndarray): indices of the points to insert, None = all points
+            cover ((float, float)): x range (x0, x1) whose points are all in ids (wrapped on a torus);
+                                    a query reaching beyond it indexes all points first
+        """
+        self.points = positions.copy()
+        self.cover = cover if ids is not None else None
+        if ids is None:
+            ids = np.arange(len(self.points))
+        if self.tuning_interval and self.builds % self.tuning_interval == 0 and len(ids):
+            self.tune(self.points[ids])
+        self.builds += 1
+        self._index(ids)
+
+    def _index(self, ids):
+        """
+        Sort the given points into the cells (and by x for the sweep).
+        """
+        # the cell order is always kept, the item contacts are resolved on it
+        cx, cy = self.cell_of(self.points[ids])
+        keys = cy * self.cols + cx
+        sort = np.argsort(keys, kind='stable')
+        self.order = ids[sort]
+        self.sortedKeys = keys[sort]
+        if self.mode == 'sweep':
+            sort = np.argsort(self.points[ids, 0], kind='stable')
+            self.xOrder = ids[sort]
+            self.sortedX = self.points[self.xOrder, 0]
+
+    def tune(self, points):
+        """
+        Choose cell size and query mode for the given point distribution.
+        The expected cost of a query with the last query radius is estimated for
+        a ladder of cell sizes and for the sweep on x.
+
+        Args:
+            points (np.ndarray): (N, 2) array of the indexed positions
+        """
+        current = (self.mode, self.cell_size)
+        costs = {}
+        candidates = len(points)
+        for scale in self.SCALES:
+            cell_size = self.initialCellSize * scale
+            if cell_size >= self.MIN_CELL_SIZE and 1 < self._cell_count(cell_size) <= self.MAX_CELLS:
+                cost, found = self._grid_cost(points, cell_size)
+                costs[('grid', cell_size)] = cost
+                candidates = min(candidates, found)
+        # the sweep returns about as many candidates as the finest grid
+        costs[('sweep', self.cell_size)] = self._sweep_cost(points) + candidates
+        if current in costs:
+            costs[current] *= self.HYSTERESIS
+        mode, cell_size = min(costs, key=costs.get)
+        self.mode = mode
+        if cell_size != self.cell_size:
+            self.set_cell_size(cell_size)
+
+    def _cell_count(self, cell_size):
+        return axis_cells(self.width, cell_size, self.periodic)[0] * axis_cells(self.height, cell_size, self.periodic)[0]
+
+    def _grid_cost(self, points, cell_size):
+        """
+        Returns: expected cost and expected number of candidates of a radius query on a grid with the given cell size
+        """
+        cols, width = axis_cells(self.width, cell_size, self.periodic)
+        rows, height = axis_cells(self.height, cell_size, self.periodic)
+        cx = (points[:, 0] // width).astype(np.intp)
+        cy = (points[:, 1] // height).astype(np.intp)
+        if self.periodic:
+            cx, cy = cx % cols, cy % rows
+        else:
+            cx, cy = np.clip(cx, 0, cols - 1), np.clip(cy, 0, rows - 1)
+        occupancy = np.bincount(cy * cols + cx, minlength=rows * cols).reshape(rows, cols)
+
+        # points in the block of cells around every cell (box sum over an integral image)
+        span = math.ceil(self.queryRadius / cell_size)
+        padded = np.pad(occupancy, span, mode='wrap' if self.periodic else 'constant')
+        integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), dtype=np.int64)
+        integral[1:, 1:] = padded.cumsum(0).cumsum(1)
+        w = 2 * span + 1
+        block = integral[w:, w:] - integral[:-w, w:] - integral[w:, :-w] + integral[:-w, :-w]
+
+        # a query visits the block of the cell of its point: weight each cell by its occupancy
+        candidates = (occupancy * block).sum() / len(points)
+        return candidates + self.ROW_COST * min(w, rows), candidates
+
+    def _sweep_cost(self, points):
+        """
+        Returns: expected cost of a radius query with a sweep on x, without the returned candidates
+        """
+        r = self.queryRadius
+        x = np.sort(points[:, 0])
+        band = np.searchsorted(x, x + r, side='right') - np.searchsorted(x, x - r, side='left')
+        if self.periodic:
+            band += np.searchsorted(x, x + r - self.width, side='right')
+            band += len(x) - np.searchsorted(x, x - r + self.width, side='left')
+            band = np.minimum(band, len(x))
+        return self.SWEEP_COST * band.mean() + self.ROW_COST
+
+    def _index_ranges(self, c0, c1, n):
+        """
+        Split the inclusive cell index range c0..c1 into ranges inside 0..n-1.
+        Out of range indices are wrapped (periodic) or clipped.
+        """
+        if not self.periodic:
+            c0, c1 = max(c0, 0), min(c1, n - 1)
+            return [(c0, c1)] if c0 <= c1 else []
+        if c1 - c0 + 1 >= n:
+            return [(0, n - 1)]
+        c0, c1 = c0 % n, c1 % n
+        if c0 <= c1:
+            return [(c0, c1)]
+        return [(c0, n - 1), (0, c1)]
+
+    def query_cells(self, cx0, cy0, cx1, cy1):
+        """
+        Collect the points of all cells in an inclusive block of cells.
+
+        Returns: array of point indices
+        """
+        col_ranges = self._index_ranges(cx0, cx1, self.cols)
+        row_ranges = self._index_ranges(cy0, cy1, self.rows)
+        if not col_ranges or not row_ranges:
+            return np.zeros(0, dtype=np.intp)
+
+        # one contiguous key range per cell row and column segment of the block
+        row_starts = np.concatenate([np.arange(a, b + 1) for a, b in row_ranges]) * self.cols
+        lo = np.concatenate([np.searchsorted(self.sortedKeys, row_starts + a, side='left') for a, _ in col_ranges])
+        hi = np.concatenate([np.searchsorted(self.sortedKeys, row_starts + b, side='right') for _, b in col_ranges])
+        if len(lo) == 1:
+            return self.order[lo[0]:hi[0]]
+        return np.concatenate([self.order[a:b] for a, b in zip(lo, hi)])
+
+    def query_rect(self, x0, y0, x1, y1):
+        """
+        Collect the points of all cells overlapping a world rectangle.
+        The result is a superset of the points inside the rectangle.
+
+        Returns: array of point indices
+        """
+        if self.cover is not None and not self._covers(x0, x1):
+            self.cover = None
+            self._index(np.arange(len(self.points)))
+        if self.mode == 'sweep':
+            return self._sweep_rect(x0, y0, x1, y1)
+        w, h = self.cellWidth, self.cellHeight
+        return self.query_cells(int(x0 // w), int(y0 // h), int(x1 // w), int(y1 // h))
+
+    def _covers(self, x0, x1):
+        """
+        Returns: True if all points with x0 <= x <= x1 are indexed
+        """
+        c0, c1 = self.cover
+        if not self.periodic:
+            return (x0 >= c0 or c0 <= 0) and (x1 <= c1 or c1 >= self.width)
+        if c1 - c0 >= self.width:
+            return True
+        shift = self.width * math.floor((x0 - c0) / self.width)
+        return x1 - shift <= c1
+
+    def query_radius(self, x, y, radius):
+        """
+        Collect the candidates within radius of a point, a superset of the points in range.
+        The radius is remembered for the tuning.
+
+        Returns: array of point indices
+        """
+        self.queryRadius = radius
+        return self.query_rect(x - radius, y - radius, x + radius, y + radius)
+
+    def _sweep_rect(self, x0, y0, x1, y1):
+        """
+        Returns: indices of the points inside a world rectangle, found by the sweep on x
+        """
+        if self.periodic and x1 - x0 < self.width:
+            a, b = x0 % self.width, x1 % self.width
+            x_ranges = [(a, b)] if a <= b else [(a, self.width), (0, b)]
+        elif self.periodic:
+            x_ranges = [(-math.inf, math.inf)]
+        else:
+            x_ranges = [(x0, x1)]
+        lo = np.searchsorted(self.sortedX, [a for a, _ in x_ranges], side='left')
+        hi = np.searchsorted(self.sortedX, [b for _, b in x_ranges], side='right')
+        idx = self.xOrder[lo[0]:hi[0]] if len(x_ranges) == 1 else \
+            np.concatenate([self.xOrder[a:b] for a, b in zip(lo, hi)])
+
+        y = self.points[idx, 1]
+        if not self.periodic or (y0 >= 0 and y1 < self.height):
+            return idx[(y >= y0) & (y <= y1)]
+        if y1 - y0 >= self.height:
+            return idx
+        return idx[(y - y0) % self.height <= y1 - y0]
+
+
+class StaticGrid():
+    """
+    Bucket grid over axis-aligned bounding boxes of static objects.
+    Every object is registered in all cells its box overlaps.
+
+    Args:
+        cell_size (int): edge length of one grid cell in pixels
+    """
+    def __init__(self, cell_size):
+        """
+        Initialize static grid object.
+        """
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def insert(self, index, x0, y0, x1, y1):
+        """
+        Register object index with the bounding box (x0, y0) - (x1, y1).
+        """
+        cs = self.cell_size
+        for cx in range(int(x0 // cs), int(x1 // cs) + 1):
+            for cy in range(int(y0 // cs), int(y1 // cs) + 1):
+                self.cells.setdefault((cx, cy), []).append(index)
+
+    def query_rect(self, x0, y0, x1, y1):
+        """
+        Returns: sorted list of object indices whose boxes may overlap the rectangle
+        """
+        cs = self.cell_size
+        found = set()
+        for cx in range(int(x0 // cs), int(x1 // cs) + 1):
+            for cy in range(int(y0 // cs), int(y1 // cs) + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return sorted(found)
+
+
+# =============================================================================
+# Helper functions
+# =============================================================================
+def axis_cells(length, cell_size, periodic):
+    """
+    Cells along one world axis. On a torus the cells are stretched so that a whole number
+    of them spans the axis, a partial last cell would not wrap onto the first one.
+
+    Args:
+        length (float): world width or height
+        cell_size (float): requested edge length of a cell
+        periodic (bool): the axis wraps around (torus topology)
+    Returns: number of cells and their edge length (at least cell_size, except for tiny worlds)
+    """
+    if periodic:
+        count = max(1, int(length // cell_size))
+        return count, length / count
+    return max(1, math.ceil(length / cell_size)), cell_size
+
+
+def radius_neighbors(points, radius, max_neighbors, world_size, periodic=False, queries=None):
+    """
+    Closest points within radius of every query point, all queries in one batch.
+    A point is not its own neighbour, equal distances are ordered by index.
+
+    Args:
+        points (np.ndarray): (N, 2) positions
+        radius (float): search radius
+        max_neighbors (int): number of columns of the result, the closest points are kept
+        world_size (np.ndarray): width and height of the world
+        periodic (bool): minimum image distances on a torus of world_size
+        queries (np.ndarray): indices of the query points, None = all points
+    Returns: (indices, distances), (M, max_neighbors) arrays sorted by distance, padded with -1 and inf
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    queries = np.arange(len(points)) if queries is None else np.asarray(queries, dtype=np.intp)
+    indices = np.full((len(queries), max_neighbors), -1, dtype=np.intp)
+    distances = np.full((len(queries), max_neighbors), np.inf)
+    if len(queries) == 0 or len(points) < 2 or max_neighbors == 0:
+        return indices, distances
+
+    # cells are at least radius wide, so all neighbours lie in the 3x3 block
+    worldSize = np.asarray(world_size, dtype=float)
+    cx, cy, cols, rows = _grid_cells(points, radius, worldSize, periodic)
+    keys = cy * cols + cx
+    order = np.argsort(keys, kind='stable')
+
+    found = []
+    origins = points[queries]
+    for i, j in cell_pairs(cx[queries], cy[queries], cols, rows, periodic, keys[order], order):
+        d = points[j] - origins[i]
+        if periodic:
+            d -= worldSize * np.round(d / worldSize)
+        squared = np.einsum('ij,ij->i', d, d)
+        keep = (squared <= radius * radius) & (j != queries[i])
+        # the closest of a chunk, a query may continue in the next chunk
+        found.append(_closest(i[keep], j[keep], np.sqrt(squared[keep]), max_neighbors))
+    if len(found) == 1:
+        i, j, dist, rank = found[0]
+    else:
+        i, j, dist = (np.concatenate([chunk[c] for chunk in found]) for c in range(3))
+        i, j, dist, rank = _closest(i, j, dist, max_neighbors)
+    indices[i, rank] = j
+    distances[i, rank] = dist
+    return indices, distances
+
+
+def nearest_neighbors(points, k, world_size, periodic=False, queries=None, max_radius=np.inf):
+    """
+    Exact k nearest points of every query point, all queries in one batch.
+    The search radius of a query is estimated from the local density of the points and
+    grown for the queries that found fewer than k points; queries with the same radius
+    are answered by one radius_neighbors batch.
+
+    Args:
+        points (np.ndarray): (N, 2) positions
+        k (int): number of neighbours
+        world_size (np.ndarray): width and height of the world
+        periodic (bool): minimum image distances on a torus of world_size
+        queries (np.ndarray): indices of the query points, None = all points
+        max_radius (float): ignore points farther away
+    Returns: (indices, distances), (M, k) arrays sorted by distance, padded with -1 and inf
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    queries = np.arange(len(points)) if queries is None else np.asarray(queries, dtype=np.intp)
+    indices = np.full((len(queries), k), -1, dtype=np.intp)
+    distances = np.full((len(queries), k), np.inf)
+    want = min(k, len(points) - 1)
+    if len(queries) == 0 or want <= 0:
+        return indices, distances
+
+    # local density: points in the 3x3 block around the query on the finest of a series of
+    # halved grids where the block still holds 2k points (starting with about k points per cell)
+    worldSize = np.asarray(world_size, dtype=float)
+    coarse = math.sqrt(k * worldSize.prod() / len(points))
+    density = np.empty(len(queries))
+    active = np.arange(len(queries))
+    cell_size = coarse
+    while len(active):
+        cx, cy, cols, rows = _grid_cells(points, cell_size, worldSize, periodic)
+        nkeys, valid = _neighbor_cells(cx[queries[active]], cy[queries[active]], cols, rows, periodic)
+        sortedKeys = np.sort(cy * cols + cx)
+        block = ((np.searchsorted(sortedKeys, nkeys, side='right') - np.searchsorted(sortedKeys, nkeys, side='left'))
+                 * valid).sum(axis=1)
+        enough = block > 2 * k
+        update = active if cell_size == coarse else active[enough]
+        density[update] = block[enough | (cell_size == coarse)] * (cols * rows) / (9 * worldSize.prod())
+        active = active[enough]
+        if max(cols, rows) >= MAX_AXIS_CELLS:
+            break
+        cell_size /= 2
+
+    # radius holding about 2k points at that density, in steps of sqrt(2)
+    level = np.ceil(2 * np.log2(np.sqrt(2 * k / (math.pi * density)) / coarse)).astype(np.intp)
+    # beyond this radius a query holds all points
+    if periodic:
+        limit = math.hypot(*(worldSize / 2))
+    else:
+        limit = math.hypot(*np.ptp(points, axis=0))
+
+    pending = np.arange(len(queries))
+    while len(pending):
+        unfinished = []
+        for value in np.unique(level[pending]):
+            group = pending[level[pending] == value]
+            r = coarse * 2.0 ** (value / 2)
+            final = r >= min(limit, max_radius)
+            if final:
+                r = max_radius if max_radius < limit else np.inf
+            idx, dist = radius_neighbors(points, r, k, worldSize, periodic, queries[group])
+            done = np.ones(len(group), dtype=bool) if final else idx[:, want - 1] >= 0
+            indices[group[done]] = idx[done]
+            distances[group[done]] = dist[done]
+            unfinished.append(group[~done])
+        pending = np.concatenate(unfinished)
+        level[pending] += 2
+    return indices, distances
+
+
+def cell_pairs(cx, cy, cols, rows, periodic, sortedKeys, order, chunk_size=1 << 20):
+    """
+    Expand the pairs of query points and indexed points in the same or a neighbouring cell.
+
+    Args:
+        cx, cy (np.ndarray): cell column and row of every query point
+        sortedKeys (np.ndarray): sorted cell keys (row * cols + column) of the indexed points
+        order (np.ndarray): indexed point indices in the same order
+    Yields: (i, j) index arrays (query point, indexed point) of the pairs, sorted by i, about chunk_size pairs at a time
+    """
+    nkeys, valid = _neighbor_cells(cx, cy, cols, rows, periodic)
+    nkeys = nkeys[valid]
+    owner = np.broadcast_to(np.arange(len(cx))[:, None], valid.shape)[valid]
+
+    lo = np.searchsorted(sortedKeys, nkeys, side='left')
+    counts = np.searchsorted(sortedKeys, nkeys, side='right') - lo
+    # split at cell boundaries so that one chunk holds about chunk_size pairs
+    ends = np.cumsum(counts)
+    bounds = np.searchsorted(ends, np.arange(chunk_size, ends[-1], chunk_size)) + 1
+    for a, b in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(counts)]))):
+        c = counts[a:b]
+        i = np.repeat(owner[a:b], c)
+        start = np.repeat(lo[a:b] - np.cumsum(c) + c, c)
+        yield i, order[start + np.arange(len(i))]
+
+
+def _grid_cells(points, cell_size, world_size, periodic):
+    """
+    Returns: cell column and row of every point, number of columns and rows of a grid with cells of at least cell_size
+    """
+    cols, rows = (max(1, min(int(s // cell_size) if cell_size > 0 else MAX_AXIS_CELLS, MAX_AXIS_CELLS))
+                  for s in world_size)
+    cx = (points[:, 0] * (cols / world_size[0])).astype(np.intp)
+    cy = (points[:, 1] * (rows / world_size[1])).astype(np.intp)
+    if periodic:
+        return cx % cols, cy % rows, cols, rows
+    return np.clip(cx, 0, cols - 1), np.clip(cy, 0, rows - 1), cols, rows
+
+
+def _neighbor_cells(cx, cy, cols, rows, periodic):
+    """
+    Returns: (M, 9) keys of the 3x3 cell blocks around the given cells and a mask of the cells to visit
+    """
+    offsets = np.array([(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)])
+    ncx = cx[:, None] + offsets[:, 0]
+    ncy = cy[:, None] + offsets[:, 1]
+    if periodic:
+        ncx, ncy = ncx % cols, ncy % rows
+        nkeys = ncy * cols + ncx
+        valid = np.ones(ncx.shape, dtype=bool)
+        if cols < 3 or rows < 3:
+            # small grids wrap onto the same cell twice, count every cell once
+            nkeys.sort(axis=1)
+            valid[:, 1:] = nkeys[:, 1:] != nkeys[:, :-1]
+        return nkeys, valid
+    return ncy * cols + ncx, (ncx >= 0) & (ncx < cols) & (ncy >= 0) & (ncy < rows)
+
+
+def _closest(i, j, dist, k):
+    """
+    Keep the k closest pairs of every query i.
+
+    Returns: i, j, dist and the rank of the pair within its query, sorted by query, distance and index
+    """
+    if len(i) == 0:
+        return i, j, dist, i
+    # sort by index (unique within a query), then a stable float sort on query * scale + distance
+    sort = np.argsort(j)
+    sort = sort[np.argsort(i[sort] * (dist.max() + 1) + dist[sort], kind='stable')]
+    i, j, dist = i[sort], j[sort], dist[sort]
+    rank = np.arange(len(i)) - np.searchsorted(i, i, side='left')
+    keep = rank < k
+    return i[keep], j[keep], dist[keep], rank[keep]
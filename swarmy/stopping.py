@@ -0,0 +1,143 @@
+"""
+Description:
+This module includes the stop conditions of an experiment.
+A stop condition is checked every `interval` timesteps on the swarm arrays of the
+environment and ends the run early, e.g. when a metric has converged.
+
+Example:
+    conditions = [MetricConverged(coverage_metric, window=20, tolerance=1e-3, interval=50),
+                  WallClockBudget(600)]
+    Experiment(config, [MyController], [BumperSensor], My_environment, MyAgent, stop_conditions=conditions)
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import time
+from abc import abstractmethod
+from collections import deque
+
+# =============================================================================
+# Class
+# =============================================================================
+class StopCondition():
+    """
+    Base class of all stop conditions.
+
+    Args:
+        interval (int): check every interval timesteps
+    """
+    reproducible = True     # False if the condition depends on more than the simulation, such runs are not cached
+
+    def __init__(self, interval=1):
+        """
+        Initialize stop condition.
+        """
+        self.interval = interval
+
+    def reset(self):
+        """
+        Called once when the experiment starts.
+        """
+        pass
+
+    @abstractmethod
+    def check(self, environment, timestep):
+        """
+        Returns: True if the experiment should stop
+        """
+        print('Stop condition not implemented')
+        return False
+
+    def describe(self):
+        """
+        Returns: stop reason stored in the experiment result
+        """
+        return type(self).__name__
+
+
+class MetricConverged(StopCondition):
+    """
+    Stop when a metric changed less than tolerance over the last window checks.
+
+    Args:
+        metric (function): metric(environment) -> float
+        window (int): number of checks that are compared
+        tolerance (float): maximum change (max - min) within the window
+        interval (int): check every interval timesteps
+    """
+    def __init__(self, metric, window=10, tolerance=1e-3, interval=50):
+        super().__init__(interval)
+        self.metric = metric
+        self.window = window
+        self.tolerance = tolerance
+        self.values = deque(maxlen=window)
+
+    def reset(self):
+        self.values.clear()
+
+    def check(self, environment, timestep):
+        self.values.append(self.metric(environment))
+        return len(self.values) == self.window and max(self.values) - min(self.values) < self.tolerance
+
+    def describe(self):
+        return 'metric converged ({})'.format(getattr(self.metric, '__name__', 'metric'))
+
+
+class TargetReached(StopCondition):
+    """
+    Stop when a metric reaches a target value.
+
+    Args:
+        metric (function): metric(environment) -> float
+        target (float): target value
+        above (bool): True = stop when metric >= target, False = stop when metric <= target
+        interval (int): check every interval timesteps
+    """
+    def __init__(self, metric, target, above=True, interval=10):
+        super().__init__(interval)
+        self.metric = metric
+        self.target = target
+        self.above = above
+
+    def check(self, environment, timestep):
+        value = self.metric(environment)
+        return value >= self.target if self.above else value <= self.target
+
+    def describe(self):
+        return 'target reached ({})'.format(getattr(self.metric, '__name__', 'metric'))
+
+
+class WallClockBudget(StopCondition):
+    """
+    Stop after a wall-clock time budget.
+
+    Args:
+        seconds (float): time budget of the run
+        interval (int): check every interval timesteps
+    """
+    reproducible = False    # the stopping timestep depends on the machine load
+
+    def __init__(self, seconds, interval=10):
+        super().__init__(interval)
+        self.seconds = seconds
+        self.start = None
+
+    def reset(self):
+        self.start = time.perf_counter()
+
+    def check(self, environment, timestep):
+        return time.perf_counter() - self.start >= self.seconds
+
+    def describe(self):
+        return 'wall-clock budget of {} s'.format(self.seconds)
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+def coverage_metric(environment):
+    """
+    Fraction of the arena visited by the swarm (requires coverage_cell_size > 0).
+    """
+    return environment.coverage.fraction()
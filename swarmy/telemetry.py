@@ -0,0 +1,266 @@
+"""
+Description:
+This module streams live snapshots of a running experiment to local subscribers
+(telemetry_port in config.yaml), e.g. to monitor headless runs on a cluster node.
+
+The server runs an asyncio event loop in a background thread. The simulation hands
+over at most `rate` snapshots per second; a snapshot is only encoded when it is due
+and somebody is listening. Every subscriber has a single pending slot and at most
+one snapshot in flight: after reading a snapshot the subscriber sends one byte to
+request the next one, and nothing is buffered beyond a small socket send buffer.
+Until a subscriber asks again, newer snapshots replace the pending one, so a slow
+subscriber skips snapshots and always receives the newest. The simulation loop
+never waits for a subscriber.
+
+Wire format (little endian), one frame per snapshot:
+    uint32 payload length
+    header: 4s magic b'SWTM', uint8 version, uint32 timestep, uint32 agents, uint16 metrics, uint16 timings
+    float32 positions (agents x 2), float32 headings (agents)
+    metrics and timings: uint8 name length, name (utf-8), float64 value
+The first snapshot is sent unrequested, every further one after a request byte of the subscriber.
+
+Monitor from another process:
+    python -m swarmy.telemetry [port]
+or in Python:
+    for snapshot in subscribe(port):
+        print(snapshot['timestep'], snapshot['metrics'])
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import asyncio
+import socket
+import struct
+import sys
+import threading
+import time
+import numpy as np
+
+MAGIC = b'SWTM'
+VERSION = 2
+SEND_BUFFER = 65536         # kernel send buffer per subscriber in bytes
+HEADER = struct.Struct('<4sBIIHH')
+LENGTH = struct.Struct('<I')
+VALUE = struct.Struct('<d')
+
+# =============================================================================
+# Class
+# =============================================================================
+class TelemetryServer():
+    """
+    Throttled snapshot stream on a local TCP socket.
+
+    Args:
+        port (int): TCP port, 0 = any free port (see self.port)
+        rate (float): maximum number of snapshots per second
+        host (str): interface to listen on, local only by default
+    """
+    def __init__(self, port, rate=10, host='127.0.0.1'):
+        """
+        Initialize server object, start listening in a background thread.
+        """
+        self.interval = 1 / rate if rate > 0 else 0
+        self.nextTime = 0.0
+        self.clients = set()
+        self.sent = 0                           # snapshots written to subscribers
+        self.dropped = 0                        # snapshots replaced before they could be written
+
+        # per-phase durations accumulated between two snapshots
+        self.phaseSums = {}
+        self.phaseSteps = 0
+        self.lastTime = time.perf_counter()
+
+        self.loop = asyncio.new_event_loop()
+        self.server = None
+        self.port = None
+        self.error = None
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._serve, args=(host, port, ready), daemon=True)
+        self.thread.start()
+        ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    def publish(self, timestep, environment, metrics=None, phases=()):
+        """
+        Hand over a snapshot if one is due, called once per timestep by the experiment.
+
+        Args:
+            timestep (int): current timestep
+            environment (environment.py): environment with the swarm arrays
+            metrics (metrics.py): metrics stream, its latest sample is sent
+            phases (((str, float), ...)): durations of the phases of this timestep in seconds
+        """
+        for name, seconds in phases:
+            self.phaseSums[name] = self.phaseSums.get(name, 0.0) + seconds
+        self.phaseSteps += 1
+        now = time.perf_counter()
+        if not self.clients or now < self.nextTime:
+            return
+        self.nextTime = now + self.interval
+
+        values = {}
+        if metrics is not None and metrics.timesteps:
+            values = {name: column[-1] for name, column in metrics.columns.items()}
+        if environment.coverage is not None:
+            values['coverage'] = environment.coverage.fraction()
+        timings = {name: 1000 * total / self.phaseSteps for name, total in self.phaseSums.items()}
+        timings['steps_per_second'] = self.phaseSteps / max(now - self.lastTime, 1e-9)
+        self.phaseSums = {}
+        self.phaseSteps = 0
+        self.lastTime = now
+
+        packet = encode_snapshot(timestep, environment.get_agent_positions(), environment.get_agent_headings(),
+                                 values, timings)
+        self.loop.call_soon_threadsafe(self._broadcast, packet)
+
+    def close(self):
+        """
+        Disconnect all subscribers and stop the server thread.
+        """
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+#%% Event loop (server thread)
+
+    def _serve(self, host, port, ready):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(self._subscriber, host, port))
+            self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as error:
+            self.error = error
+            ready.set()
+            return
+        ready.set()
+        self.loop.run_forever()
+
+        # shutdown: stop listening and disconnect all subscribers
+        self.server.close()
+        for client in list(self.clients):
+            client.writer.close()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+    def _broadcast(self, packet):
+        for client in self.clients:
+            if client.packet is not None:
+                self.dropped += 1
+            client.packet = packet
+            client.wake.set()
+
+    async def _subscriber(self, reader, writer):
+        # no write buffering: drain() returns once the snapshot is completely in the small kernel buffer
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+        writer.transport.set_write_buffer_limits(high=0)
+        client = _Subscriber(writer)
+        self.clients.add(client)
+        try:
+            while True:
+                await client.wake.wait()
+                client.wake.clear()
+                packet, client.packet = client.packet, None
+                writer.write(packet)
+                self.sent += 1
+                await writer.drain()
+                # meanwhile newer snapshots replace the pending one
+                if not await reader.read(1):
+                    break                   # subscriber disconnected
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+
+
+class _Subscriber():
+    """
+    Connection of one subscriber with a single slot for the next snapshot.
+    """
+    def __init__(self, writer):
+        self.writer = writer
+        self.packet = None
+        self.wake = asyncio.Event()
+
+
+# =============================================================================
+# Helper functions
+# =============================================================================
+def encode_snapshot(timestep, positions, headings, metrics, timings):
+    """
+    Returns: length-prefixed binary frame of one snapshot (see module description)
+    """
+    n = len(positions)
+    parts = [HEADER.pack(MAGIC, VERSION, timestep, n, len(metrics), len(timings)),
+             np.asarray(positions, dtype='<f4').tobytes(), np.asarray(headings, dtype='<f4').tobytes()]
+    for values in (metrics, timings):
+        for name, value in values.items():
+            encoded = name.encode()
+            parts.append(bytes((len(encoded),)) + encoded + VALUE.pack(value))
+    payload = b''.join(parts)
+    return LENGTH.pack(len(payload)) + payload
+
+
+def decode_snapshot(payload):
+    """
+    Args:
+        payload (bytes): frame without the length prefix
+    Returns: dict with timestep, positions (N, 2), headings (N,), metrics and timings (name -> value)
+    """
+    magic, version, timestep, n, n_metrics, n_timings = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a swarmy telemetry snapshot (version {})'.format(version))
+    offset = HEADER.size
+    positions = np.frombuffer(payload, dtype='<f4', count=2 * n, offset=offset).reshape(n, 2)
+    offset += 8 * n
+    headings = np.frombuffer(payload, dtype='<f4', count=n, offset=offset)
+    offset += 4 * n
+    values = []
+    for count in (n_metrics, n_timings):
+        named = {}
+        for _ in range(count):
+            length = payload[offset]
+            name = payload[offset + 1:offset + 1 + length].decode()
+            offset += 1 + length
+            named[name] = VALUE.unpack_from(payload, offset)[0]
+            offset += VALUE.size
+        values.append(named)
+    return {'timestep': timestep, 'positions': positions, 'headings': headings,
+            'metrics': values[0], 'timings': values[1]}
+
+
+def subscribe(port, host='127.0.0.1'):
+    """
+    Connect to a telemetry server and yield the decoded snapshots until the run ends.
+    """
+    with socket.create_connection((host, port)) as connection:
+        stream = connection.makefile('rb')
+        while True:
+            prefix = stream.read(LENGTH.size)
+            if len(prefix) < LENGTH.size:
+                return
+            payload = stream.read(LENGTH.unpack(prefix)[0])
+            yield decode_snapshot(payload)
+            connection.sendall(b'\x01')       # request the next snapshot
+
+
+def main(port):
+    """
+    Print one line per snapshot.
+    """
+    for snapshot in subscribe(port):
+        metrics = ' '.join('{}={:.3g}'.format(k, v) for k, v in snapshot['metrics'].items())
+        timings = ' '.join('{}={:.3g}'.format(k, v) for k, v in snapshot['timings'].items())
+        print('t={} agents={} {} | {}'.format(snapshot['timestep'], len(snapshot['positions']), metrics, timings))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
@@ -0,0 +1,209 @@
+"""
+Description:
+This module loads the static obstacles of a world from a map file instead of code.
+
+    text map (.txt, .map):  one character per cell, '#' is a wall, every other character is free
+    bitmap (.png, .bmp, ...): one pixel per cell, dark pixels (luminance below threshold) are walls
+
+A map is compiled into
+    - a boolean occupancy grid for constant-time point, area and segment checks
+      (sensors, motion integration and spawn placement) and
+    - a small set of merged rectangles for drawing (runs of wall cells in a row,
+      stacked with identical runs of the following rows).
+
+The compiled map is cached next to the source file (<map>.compiled.npz) and reused as
+long as the content of the source file and the load parameters are unchanged.
+
+Example (config.yaml):
+    world_map: world/maze.txt
+    world_map_cell_size: 10
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import hashlib
+import os
+import numpy as np
+
+CACHE_SUFFIX = '.compiled.npz'
+TEXT_SUFFIXES = ('.txt', '.map')
+
+# =============================================================================
+# Class
+# =============================================================================
+class WorldMap():
+    """
+    Compiled static map of the world.
+
+    Args:
+        occupancy (np.ndarray): (rows, cols) bool grid, True = wall
+        cell_size (int): edge length of one map cell in world pixels
+        rects (np.ndarray): (K, 4) merged wall rectangles (x, y, width, height) in world pixels, None = merge now
+    """
+    def __init__(self, occupancy, cell_size, rects=None):
+        """
+        Initialize world map object.
+        """
+        self.occupancy = np.ascontiguousarray(occupancy, dtype=bool)
+        self.rows, self.cols = self.occupancy.shape
+        self.cell_size = cell_size
+        self.width = self.cols * cell_size
+        self.height = self.rows * cell_size
+        self.rects = merge_rects(self.occupancy) * cell_size if rects is None else np.asarray(rects, dtype=np.intp).reshape(-1, 4)
+        self.summedArea = None      # integral image of the occupancy (see area_free)
+
+    def occupied(self, x, y):
+        """
+        Returns: True if the point lies in a wall cell or outside of the map
+        """
+        cx, cy = int(x // self.cell_size), int(y // self.cell_size)
+        if cx < 0 or cy < 0 or cx >= self.cols or cy >= self.rows:
+            return True
+        return bool(self.occupancy[cy, cx])
+
+    def occupied_many(self, positions):
+        """
+        Returns: (N,) bool array, True for points in a wall cell or outside of the map
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        cx = np.floor(positions[:, 0] / self.cell_size).astype(np.intp)
+        cy = np.floor(positions[:, 1] / self.cell_size).astype(np.intp)
+        inside = (cx >= 0) & (cx < self.cols) & (cy >= 0) & (cy < self.rows)
+        hit = ~inside
+        hit[inside] = self.occupancy[cy[inside], cx[inside]]
+        return hit
+
+    def segments_blocked(self, starts, ends):
+        """
+        Sample segments at half the cell size.
+
+        Args:
+            starts (np.ndarray): (N, 2) start points
+            ends (np.ndarray): (N, 2) end points
+        Returns: (N,) bool array, True for segments touching a wall cell
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        length = np.hypot(*(ends - starts).T)
+        samples = int(np.ceil(length.max(initial=0) * 2 / self.cell_size)) + 1
+        t = np.linspace(0, 1, samples)
+        points = starts[:, None] + t[:, None] * (ends - starts)[:, None]
+        return self.occupied_many(points.reshape(-1, 2)).reshape(len(starts), samples).any(axis=1)
+
+    def area_free(self, x, y, radius):
+        """
+        Returns: True if no wall cell overlaps the square of half size radius around the point
+        """
+        if self.summedArea is None:
+            self.summedArea = np.zeros((self.rows + 1, self.cols + 1), dtype=np.int32)
+            self.summedArea[1:, 1:] = self.occupancy.cumsum(axis=0).cumsum(axis=1)
+        cs = self.cell_size
+        x0, y0 = int((x - radius) // cs), int((y - radius) // cs)
+        x1, y1 = int((x + radius) // cs) + 1, int((y + radius) // cs) + 1
+        if x0 < 0 or y0 < 0 or x1 > self.cols or y1 > self.rows:
+            return False
+        s = self.summedArea
+        return s[y1, x1] - s[y0, x1] - s[y1, x0] + s[y0, x0] == 0
+
+    def inflate(self, radius):
+        """
+        Returns: WorldMap without rects whose walls are grown by radius (conservative, whole cells)
+        """
+        k = int(np.ceil(radius / self.cell_size))
+        padded = np.pad(self.occupancy, k, constant_values=False)
+        grown = np.zeros_like(self.occupancy)
+        for dy in range(2 * k + 1):
+            for dx in range(2 * k + 1):
+                grown |= padded[dy:dy + self.rows, dx:dx + self.cols]
+        return WorldMap(grown, self.cell_size, rects=np.zeros((0, 4)))
+
+
+# =============================================================================
+# Helper functions
+# =============================================================================
+def load_world_map(path, cell_size=10, threshold=128, wall_chars='#', use_cache=True):
+    """
+    Load a text map or bitmap, compiled geometry is read from or written to the cache file.
+
+    Args:
+        path (str): map file
+        cell_size (int): edge length of one map cell (character or pixel) in world pixels
+        threshold (int): bitmap pixels darker than this are walls
+        wall_chars (str): text map characters that are walls
+        use_cache (bool): read and write <path>.compiled.npz
+    Returns: WorldMap
+    """
+    with open(path, 'rb') as f:
+        source = f.read()
+    h = hashlib.sha256(source)
+    h.update(repr((cell_size, threshold, wall_chars)).encode())
+    key = h.hexdigest()
+
+    cachePath = path + CACHE_SUFFIX
+    if use_cache and os.path.exists(cachePath):
+        with np.load(cachePath) as cached:
+            if str(cached['key']) == key:
+                return WorldMap(cached['occupancy'], cell_size, cached['rects'])
+
+    if path.lower().endswith(TEXT_SUFFIXES):
+        occupancy = _parse_text(source.decode(), wall_chars)
+    else:
+        occupancy = _parse_bitmap(path, threshold)
+    worldMap = WorldMap(occupancy, cell_size)
+    if use_cache:
+        try:
+            with open(cachePath, 'wb') as f:
+                np.savez_compressed(f, key=key, occupancy=worldMap.occupancy, rects=worldMap.rects)
+        except OSError:
+            pass                    # read-only location, compile again next time
+    return worldMap
+
+
+def merge_rects(occupancy):
+    """
+    Cover the True cells with few rectangles: runs in each row are stacked with identical runs of the next rows.
+
+    Returns: (K, 4) array of rectangles (x, y, width, height) in cells
+    """
+    rows, cols = occupancy.shape
+    padded = np.zeros((rows, cols + 2), dtype=np.int8)
+    padded[:, 1:-1] = occupancy
+    change = np.diff(padded, axis=1)
+    rects = []
+    open_runs = {}                  # (x0, x1) -> start row of the rectangle growing downwards
+    for y in range(rows):
+        starts = np.flatnonzero(change[y] == 1)
+        ends = np.flatnonzero(change[y] == -1)
+        runs = set(zip(starts.tolist(), ends.tolist()))
+        for run in list(open_runs):
+            if run not in runs:
+                y0 = open_runs.pop(run)
+                rects.append((run[0], y0, run[1] - run[0], y - y0))
+        for run in runs:
+            open_runs.setdefault(run, y)
+    for run, y0 in open_runs.items():
+        rects.append((run[0], y0, run[1] - run[0], rows - y0))
+    return np.array(sorted(rects, key=lambda r: (r[1], r[0])), dtype=np.intp).reshape(-1, 4)
+
+
+def _parse_text(text, wall_chars):
+    """
+    Returns: (rows, cols) bool grid of a text map, short lines are padded with free cells
+    """
+    lines = text.splitlines()
+    cols = max((len(line) for line in lines), default=0)
+    occupancy = np.zeros((len(lines), cols), dtype=bool)
+    for y, line in enumerate(lines):
+        occupancy[y, :len(line)] = [c in wall_chars for c in line]
+    return occupancy
+
+
+def _parse_bitmap(path, threshold):
+    """
+    Returns: (rows, cols) bool grid of a bitmap, True for pixels darker than threshold
+    """
+    import pygame
+    pixels = pygame.surfarray.array3d(pygame.image.load(path)).transpose(1, 0, 2)
+    luminance = pixels @ np.array([0.299, 0.587, 0.114])
+    return luminance < threshold
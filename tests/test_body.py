@@ -0,0 +1,71 @@
+"""
+Description:
+The batch point in polygon test of the body outlines must agree with a scalar
+reference implementation for arbitrary headings, including fractional ones.
+
+Usage (from the repository root):
+    python -m unittest discover tests
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import os
+import sys
+import unittest
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from swarmy.body import BODY_REACH, points_in_polygons, swarm_polygons
+
+# =============================================================================
+# Tests
+# =============================================================================
+def point_in_polygon(polygon, x, y):
+    """
+    Returns: True if (x, y) lies inside the polygon (scalar even-odd ray casting)
+    """
+    inside = False
+    n = len(polygon)
+    for i in range(n):
+        x1, y1 = polygon[i]
+        x2, y2 = polygon[(i + 1) % n]
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+class PointsInPolygonsTest(unittest.TestCase):
+
+    def test_against_scalar_reference(self):
+        rng = np.random.default_rng(4)
+        n = 2000
+        positions = rng.uniform(0, 500, (n, 2))
+        headings = rng.uniform(-720, 720, n)
+        points = positions + rng.uniform(-BODY_REACH, BODY_REACH, (n, 2))
+        polygons = swarm_polygons(positions, headings)
+        inside = points_in_polygons(polygons, points)
+        expected = [point_in_polygon(polygon, x, y) for polygon, (x, y) in zip(polygons, points)]
+        np.testing.assert_array_equal(inside, expected)
+        self.assertTrue(0 < inside.sum() < n)
+
+    def test_broadcast_points_against_polygons(self):
+        rng = np.random.default_rng(5)
+        polygons = swarm_polygons(rng.uniform(0, 100, (7, 2)), rng.uniform(0, 360, 7))
+        points = rng.uniform(0, 100, (50, 2))
+        inside = points_in_polygons(polygons[None], points[:, None, :])
+        expected = [[point_in_polygon(polygon, x, y) for polygon in polygons] for x, y in points]
+        np.testing.assert_array_equal(inside, expected)
+
+    def test_chassis_and_wheels(self):
+        # chassis and wheels are inside, the gap between chassis and wheel is not
+        polygon = swarm_polygons(np.zeros((1, 2)), np.zeros(1))[0]
+        self.assertTrue(points_in_polygons(polygon, (0.0, 0.0)))
+        self.assertTrue(points_in_polygons(polygon, (20.0, 8.0)))
+        self.assertFalse(points_in_polygons(polygon, (0.0, 9.0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Description:
+A seeded run split across worker processes (processes > 1) or threads (threads > 1)
+must give the same result as the serial run, with step based and time based (dt > 0) motion.
+
+Usage (from the repository root):
+    python -m unittest discover tests
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import os
+import sys
+import unittest
+import numpy as np
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agent.my_agent import MyAgent
+from controller.my_controller import MyController
+from sensors.bumper_sensor import BumperSensor
+from world.my_world import My_environment
+from swarmy.experiment import Experiment
+
+# =============================================================================
+# Tests
+# =============================================================================
+def run(**overrides):
+    """
+    Returns: final agent positions and headings of a headless run of the shipped config
+    """
+    with open(os.path.join(ROOT, 'config.yaml')) as file:
+        config = yaml.load(file, Loader=yaml.FullLoader)
+    config.update(seed=3, number_of_agents=40, max_timestep=60, result_cache=None)
+    config.update(overrides)
+    experiment = Experiment(config, [MyController], [BumperSensor], My_environment, MyAgent)
+    experiment.run(-1)
+    environment = experiment.world
+    return environment.get_agent_positions().copy(), environment.get_agent_headings().copy()
+
+
+class DecompositionTest(unittest.TestCase):
+
+    def assert_same_as_serial(self, **overrides):
+        positions, headings = run(**overrides)
+        for processes in (2, 3):
+            with self.subTest(processes=processes, **overrides):
+                decomposed_positions, decomposed_headings = run(processes=processes, **overrides)
+                np.testing.assert_array_equal(decomposed_positions, positions)
+                np.testing.assert_array_equal(decomposed_headings, headings)
+
+    def test_step_based_motion(self):
+        self.assert_same_as_serial()
+
+    def test_time_based_motion(self):
+        self.assert_same_as_serial(dt=0.05)
+
+    def test_torus(self):
+        self.assert_same_as_serial(topology='torus')
+
+
+class ThreadPoolTest(unittest.TestCase):
+
+    def test_same_as_serial(self):
+        positions, headings = run(number_of_agents=80)
+        threaded_positions, threaded_headings = run(number_of_agents=80, threads=4)
+        np.testing.assert_array_equal(threaded_positions, positions)
+        np.testing.assert_array_equal(threaded_headings, headings)
+
+
+if __name__ == '__main__':
+    unittest.main()
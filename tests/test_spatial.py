@@ -0,0 +1,91 @@
+"""
+Description:
+Radius queries of the agent grid and item contacts must find every neighbour
+within range, also across the seam of a torus whose size is not a multiple of
+the cell size, and when only the agents of a worker's halo are indexed.
+
+Usage (from the repository root):
+    python -m unittest discover tests
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import os
+import sys
+import unittest
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from swarmy.items import Items
+from swarmy.spatial import SpatialGrid
+
+# =============================================================================
+# Tests
+# =============================================================================
+def brute_force(points, x, y, radius, world_size):
+    """
+    Returns: set of point indices within radius of (x, y), minimum image distances
+    """
+    d = np.abs(points - (x, y))
+    d = np.minimum(d, world_size - d)
+    return set(np.flatnonzero(np.hypot(d[:, 0], d[:, 1]) <= radius).tolist())
+
+
+class TorusSeamTest(unittest.TestCase):
+
+    def test_neighbour_across_seam(self):
+        grid = SpatialGrid(500, 500, 80, periodic=True)
+        grid.build(np.array([[495., 250.], [5., 250.]]))
+        self.assertEqual(sorted(grid.query_radius(495, 250, 50).tolist()), [0, 1])
+
+    def test_radius_query_against_brute_force(self):
+        rng = np.random.default_rng(1)
+        world_size = np.array([500., 470.])
+        points = rng.uniform(0, 1, (200, 2)) * world_size
+        for cell_size in (33, 80, 120, 499):
+            for mode in ('grid', 'sweep'):
+                with self.subTest(cell_size=cell_size, mode=mode):
+                    grid = SpatialGrid(500, 470, cell_size, periodic=True)
+                    grid.mode = mode
+                    grid.build(points)
+                    for x, y in points:
+                        expected = brute_force(points, x, y, 50, world_size)
+                        self.assertLessEqual(expected, set(grid.query_radius(x, y, 50).tolist()))
+
+    def test_partial_index_falls_back_outside_of_cover(self):
+        rng = np.random.default_rng(3)
+        world_size = np.array([500., 500.])
+        points = rng.uniform(0, 500, (300, 2))
+        for periodic, cover in ((False, (100.0, 250.0)), (True, (400.0, 560.0))):
+            with self.subTest(periodic=periodic):
+                x = points[:, 0]
+                inside = (x - cover[0]) % 500 <= cover[1] - cover[0] if periodic else (x >= cover[0]) & (x <= cover[1])
+                grid = SpatialGrid(500, 500, 80, periodic=periodic)
+                for qx in (130.0, 30.0, 480.0, 350.0):
+                    grid.build(points, np.flatnonzero(inside), cover)
+                    found = set(grid.query_radius(qx, 250, 50).tolist())
+                    expected = brute_force(points, qx, 250, 50, world_size if periodic else np.array([np.inf, np.inf]))
+                    self.assertLessEqual(expected, found)
+
+    def test_item_contacts_across_seam(self):
+        rng = np.random.default_rng(2)
+        world_size = np.array([500., 500.])
+        agents = rng.uniform(0, 500, (100, 2))
+        items = Items(500, 500, 80, periodic=True)
+        items.add_many(rng.uniform(0, 500, (50, 2)), 10)
+        grid = SpatialGrid(500, 500, 80, periodic=True)
+        grid.build(agents)
+        pairs = set(zip(*(a.tolist() for a in items.contact_pairs(grid))))
+        reach = items.AGENT_RADIUS + 10
+        for item, (x, y) in enumerate(items.positions):
+            for agent in brute_force(agents, x, y, reach, world_size):
+                self.assertIn((agent, item), pairs)
+            found = set(items.query_rect(x - reach, y - reach, x + reach, y + reach))
+            self.assertLessEqual(brute_force(items.positions, x, y, reach, world_size), found)
+
+
+if __name__ == '__main__':
+    unittest.main()
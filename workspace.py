@@ -22,6 +22,8 @@ agent_controller = [MyController]
 # add your sensors, if you have more than one sensor, add them to the list all sensors are added to each robot
 agent_sensing = [BumperSensor]
 
-exp1 = Experiment(config, agent_controller, agent_sensing, My_environment, MyAgent)
+# the guard is needed when the experiment is split across processes (processes > 1 in config.yaml)
+if __name__ == "__main__":
+    exp1 = Experiment(config, agent_controller, agent_sensing, My_environment, MyAgent)
 
-exp1.run(1)
+    exp1.run(1)
@@ -1,3 +1,5 @@
+import random
+
 import numpy as np
 import pygame
 
@@ -17,7 +19,32 @@ class My_environment(Environment):
             self.staticRectList.append(color, pygame.Rect(x, y, width, height), border_width))
         Returns:
         """
-        # Boundary walls
+        # Boundary walls (a torus has no borders)
+        if self.config.get("topology", "bounded") != "torus":
+            self.add_boundary_walls()
+
+        # A map file (world_map in config.yaml) replaces the hand-coded obstacles
+        if self.worldMap is not None:
+            return
+
+        # Add obstacles in the arena
+        self.staticRectList.append(
+            ["RED", pygame.Rect(150, 150, 60, 60), 0]
+        )  # Square obstacle
+        self.staticRectList.append(
+            ["RED", pygame.Rect(300, 100, 40, 150), 0]
+        )  # Vertical obstacle
+        self.staticRectList.append(
+            ["RED", pygame.Rect(100, 300, 150, 40), 0]
+        )  # Horizontal obstacle
+        self.staticRectList.append(
+            ["RED", pygame.Rect(350, 300, 50, 50), 0]
+        )  # Small square
+
+    def add_boundary_walls(self):
+        """
+        Add the four walls enclosing the arena.
+        """
         self.staticRectList.append(
             ["BLACK", pygame.Rect(5, 5, self.config["world_width"] - 10, 5), 5]
         )
@@ -49,20 +76,6 @@ class My_environment(Environment):
             ]
         )
 
-        # Add obstacles in the arena
-        self.staticRectList.append(
-            ["RED", pygame.Rect(150, 150, 60, 60), 0]
-        )  # Square obstacle
-        self.staticRectList.append(
-            ["RED", pygame.Rect(300, 100, 40, 150), 0]
-        )  # Vertical obstacle
-        self.staticRectList.append(
-            ["RED", pygame.Rect(100, 300, 150, 40), 0]
-        )  # Horizontal obstacle
-        self.staticRectList.append(
-            ["RED", pygame.Rect(350, 300, 50, 50), 0]
-        )  # Small square
-
     def add_static_circle_object(self):
         """
         Add static circle object to the environment such as sources or sinks.
@@ -74,6 +87,24 @@ class My_environment(Environment):
             [(200, 0, 0), (250, 250), 30, 0]
         )  # Central circular obstacle
 
+    def add_item_objects(self):
+        """
+        Add movable items that the robots can push or carry.
+        Example:
+            self.items.add(x, y, radius, color)
+        Returns:
+        """
+        margin = 20
+        positions = [
+            (
+                random.uniform(margin, self.config["world_width"] - margin),
+                random.uniform(margin, self.config["world_height"] - margin),
+            )
+            for _ in range(self.config.get("number_of_items", 0))
+        ]
+        if positions:
+            self.items.add_many(positions, 6, (200, 150, 0))
+
     def set_background_color(self):
         """
         Set the background color of the environment.